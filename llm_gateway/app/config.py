@@ -8,7 +8,7 @@ il backend LLM (es. endpoint HTTP del modello, nome del modello, timeout).
 
 Ruolo nel sistema
 -----------------
-Questo modulo definisce un modello di configurazione (Pydantic) e istanzia una
+Questo modulo definisce un modello di configurazione (dataclass immutabile) e istanzia una
 configurazione globale `settings`, caricata dalle variabili d'ambiente. In caso
 di configurazione non valida, il servizio fallisce in avvio con errore esplicito,
 evitando comportamenti indefiniti a runtime.
@@ -17,42 +17,105 @@ Variabili d'ambiente
 --------------------
 - LLM_API_BASE:
     Base URL dell'API del modello LLM (default: "http://host.docker.internal:11434").
-    Viene validato come URL HTTP tramite AnyHttpUrl.
+    Viene validato come URL HTTP/HTTPS (schema e host obbligatori).
 - LLM_MODEL_NAME:
     Nome del modello da utilizzare (default: "qwen2.5:0.5b").
 - LLM_TIMEOUT_SECONDS:
     Timeout (in secondi) per le chiamate HTTP verso il modello (default: "60").
+- LLM_CACHE_SIZE:
+    Numero massimo di risposte LLM mantenute in cache LRU per payload identici
+    (default: "1024"; "0" disabilita la cache).
+- LLM_CACHE_TTL_SECONDS:
+    Durata (in secondi) di validità di una risposta in cache (default: "60").
+- LLM_INTERNAL_TOKEN:
+    Token condiviso richiesto (header X-Internal) dagli endpoint /llm/internal/*,
+    riservati ai client MAS fidati (default: vuoto, endpoint interni disabilitati).
+- LLM_GATEWAY_ENABLE_CORS:
+    Se "1"/"true", installa il middleware CORS per client browser (default: disattivo,
+    il gateway è interno alla rete Docker).
+- LLM_GATEWAY_CORS_ORIGINS:
+    Elenco di origin consentite, separate da virgola, usato solo con CORS attivo
+    (default: "*").
+- LLM_GATEWAY_DISABLE_DOCS:
+    Se "1"/"true", non espone /docs, /redoc e /openapi.json, evitando la generazione
+    dello schema OpenAPI (default: documentazione esposta).
+- LLM_TRUSTED_OUTPUT:
+    Se "1"/"true", l'output del modello è considerato già conforme allo schema (es.
+    decoding vincolato) e viene proiettato senza controlli di tipo per campo, con
+    validazione completa solo come fallback (default: disattivo).
 
 Note progettuali
 ----------------
-- L'uso di Pydantic consente validazione robusta dei parametri (es. URL ben formato).
+- La configurazione è una dataclass congelata con validazione minimale dell'URL in
+  __post_init__: per pochi campi scalari evita la costruzione di uno schema Pydantic
+  all'avvio, mantenendo il fallimento esplicito in caso di URL malformato.
 - Il fallback su valori di default garantisce che il servizio sia avviabile anche
   in assenza di variabili d'ambiente, mantenendo un comportamento prevedibile.
+- Le variabili d'ambiente sono lette e validate una sola volta all'import; i valori
+  risultanti sono esposti anche come costanti di modulo (API_BASE, MODEL_NAME,
+  TIMEOUT_SECONDS, CACHE_SIZE, CACHE_TTL_SECONDS, INTERNAL_TOKEN, ENABLE_CORS,
+  CORS_ORIGINS, EXPOSE_DOCS, TRUSTED_LLM_OUTPUT).
 """
 
 from __future__ import annotations
 
 import os
-from pydantic import BaseModel, AnyHttpUrl, ValidationError
+from dataclasses import dataclass, field
+from typing import Final, Tuple
+from urllib.parse import urlparse
 
 
-class LLMSettings(BaseModel):
+@dataclass(frozen=True, slots=True)
+class LLMSettings:
     """
     Modello di configurazione per le chiamate al backend LLM.
 
     Attributi
     ---------
     api_base:
-        Base URL dell'API LLM, validato come URL HTTP.
+        Base URL dell'API LLM, validato come URL HTTP/HTTPS.
     model_name:
         Identificativo del modello LLM da utilizzare per le richieste.
     timeout_seconds:
         Timeout (secondi) per le richieste HTTP verso il servizio LLM.
+    cache_size:
+        Dimensione massima della cache LRU delle risposte LLM (0 = disabilitata).
+    cache_ttl_seconds:
+        Durata di validità (secondi) di una risposta in cache.
+    internal_token:
+        Token condiviso per gli endpoint interni (stringa vuota = endpoint disabilitati).
+    enable_cors:
+        Abilita il middleware CORS (necessario solo per client browser).
+    cors_origins:
+        Origin consentite dal middleware CORS, se abilitato.
+    expose_docs:
+        Espone la documentazione OpenAPI (/docs, /redoc, /openapi.json).
+    trusted_llm_output:
+        Considera l'output del modello già conforme allo schema (controlli ridotti).
     """
 
-    api_base: AnyHttpUrl
+    api_base: str
     model_name: str
     timeout_seconds: float = 60.0
+    cache_size: int = 1024
+    cache_ttl_seconds: float = 60.0
+    # Escluso dalla repr per non esporre il token nei log.
+    internal_token: str = field(default="", repr=False)
+    enable_cors: bool = False
+    cors_origins: Tuple[str, ...] = ("*",)
+    expose_docs: bool = True
+    trusted_llm_output: bool = False
+
+    def __post_init__(self) -> None:
+        """
+        Valida il base URL del backend LLM.
+
+        Raises:
+            ValueError: se api_base non è un URL http/https con host.
+        """
+        parsed = urlparse(self.api_base)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            raise ValueError(f"LLM_API_BASE non è un URL HTTP valido: {self.api_base!r}")
 
     @classmethod
     def from_env(cls) -> "LLMSettings":
@@ -81,7 +144,48 @@ class LLMSettings(BaseModel):
             # Fallback conservativo: in caso di valore non numerico, si usa il default.
             timeout_seconds = 60.0
 
-        return cls(api_base=api_base, model_name=model_name, timeout_seconds=timeout_seconds)
+        # Dimensione della cache LRU delle risposte; stesso parsing conservativo del timeout.
+        cache_size_raw = os.getenv("LLM_CACHE_SIZE", "1024")
+        try:
+            cache_size = max(0, int(cache_size_raw))
+        except ValueError:
+            cache_size = 1024
+
+        # Durata di validità delle voci in cache; stesso parsing conservativo del timeout.
+        cache_ttl_raw = os.getenv("LLM_CACHE_TTL_SECONDS", "60")
+        try:
+            cache_ttl_seconds = max(0.0, float(cache_ttl_raw))
+        except ValueError:
+            cache_ttl_seconds = 60.0
+
+        # Token per gli endpoint interni: se assente, tali endpoint restano disabilitati.
+        internal_token = os.getenv("LLM_INTERNAL_TOKEN", "")
+
+        # CORS disattivato di default: nessun client browser nel deployment interno.
+        enable_cors = os.getenv("LLM_GATEWAY_ENABLE_CORS", "0").strip().lower() in ("1", "true", "yes")
+
+        # Origin consentite (lista separata da virgole); voci vuote ignorate.
+        cors_origins_raw = os.getenv("LLM_GATEWAY_CORS_ORIGINS", "*")
+        cors_origins = tuple(o.strip() for o in cors_origins_raw.split(",") if o.strip()) or ("*",)
+
+        # Documentazione OpenAPI esposta di default (utile in sviluppo e smoke test).
+        disable_docs = os.getenv("LLM_GATEWAY_DISABLE_DOCS", "0").strip().lower() in ("1", "true", "yes")
+
+        # Output LLM fidato disattivato di default: si abilita solo con decoding vincolato.
+        trusted_llm_output = os.getenv("LLM_TRUSTED_OUTPUT", "0").strip().lower() in ("1", "true", "yes")
+
+        return cls(
+            api_base=api_base,
+            model_name=model_name,
+            timeout_seconds=timeout_seconds,
+            cache_size=cache_size,
+            cache_ttl_seconds=cache_ttl_seconds,
+            internal_token=internal_token,
+            enable_cors=enable_cors,
+            cors_origins=cors_origins,
+            expose_docs=not disable_docs,
+            trusted_llm_output=trusted_llm_output,
+        )
 
 
 # Istanza di configurazione globale.
@@ -89,7 +193,22 @@ class LLMSettings(BaseModel):
 # agli altri componenti in modo immediato e consistente.
 try:
     settings = LLMSettings.from_env()
-except ValidationError as exc:
+except ValueError as exc:
     # In caso di configurazione invalidabile (es. URL malformato), si preferisce
     # fallire subito in avvio: è un errore di configurazione, non recuperabile a runtime.
     raise RuntimeError(f"Errore nella configurazione LLM: {exc}")
+
+
+# Valori di configurazione estratti una sola volta dopo la validazione.
+# Sono esposti come costanti di modulo per l'uso nel percorso critico delle chiamate
+# al runtime LLM. API_BASE è già normalizzato senza "/" finale.
+API_BASE: Final[str] = settings.api_base.rstrip("/")
+MODEL_NAME: Final[str] = settings.model_name
+TIMEOUT_SECONDS: Final[float] = settings.timeout_seconds
+CACHE_SIZE: Final[int] = settings.cache_size
+CACHE_TTL_SECONDS: Final[float] = settings.cache_ttl_seconds
+INTERNAL_TOKEN: Final[str] = settings.internal_token
+ENABLE_CORS: Final[bool] = settings.enable_cors
+CORS_ORIGINS: Final[Tuple[str, ...]] = settings.cors_origins
+EXPOSE_DOCS: Final[bool] = settings.expose_docs
+TRUSTED_LLM_OUTPUT: Final[bool] = settings.trusted_llm_output
@@ -17,28 +17,275 @@ Questo modulo incapsula:
 
 Note progettuali
 ------------------
-- Le funzioni esposte producono e consumano dizionari Python, mantenendo il resto
-  del gateway indipendente dalla forma testuale della risposta dell'LLM.
+- Le funzioni esposte ricevono i modelli Pydantic di richiesta già validati (serializzati
+  direttamente in JSON tramite il serializer di pydantic-core) e restituiscono
+  dizionari Python, mantenendo il resto del gateway indipendente dalla forma testuale
+  della risposta dell'LLM.
 - Il contratto di output è imposto tramite prompt: l'LLM deve rispondere
   "strictly in JSON" secondo uno schema definito.
 - In caso di errore verso il runtime LLM o risposta non valida, vengono sollevate
   HTTPException con codici 5xx (errore lato dipendenza esterna / gateway).
+- La (de)serializzazione JSON usa orjson (implementazione nativa), più rapida del
+  modulo `json` della libreria standard su prompt e risposte del modello.
+- Le risposte già estratte e validate (validatore fornito dall'endpoint chiamante)
+  vengono memorizzate in una cache LRU indicizzata sul
+  payload serializzato (ordine dei campi fissato dallo schema): con temperatura
+  bassa il modello è quasi deterministico, quindi payload identici possono riusare la
+  stessa risposta. Le richieste identiche concorrenti, ancora senza risposta in cache,
+  condividono un'unica chiamata in corso verso il runtime LLM. Una risposta non
+  conforme allo schema non entra mai in cache: la richiesta successiva interroga di
+  nuovo il modello invece di rigiocare lo stesso errore.
+- L'input inserito nel prompt è limitato in dimensione (liste di contesto troncate
+  agli elementi più recenti), poiché la latenza di inferenza cresce con i token.
+- Le chiamate verso il runtime LLM sono asincrone (httpx.AsyncClient condiviso):
+  durante l'attesa della risposta del modello, l'event loop può servire altre
+  richieste, senza occupare un thread del threadpool di FastAPI.
 """
 
 from __future__ import annotations
 
-import json
-from typing import Any, Dict
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 
-import requests
+import httpx
+import orjson
 from fastapi import HTTPException, status
+from pydantic import BaseModel
+
+from . import schemas
+from .config import API_BASE, CACHE_SIZE, CACHE_TTL_SECONDS, MODEL_NAME, TIMEOUT_SECONDS
+
+# Client HTTP asincrono condiviso verso il runtime LLM.
+# Viene creato all'avvio dell'applicazione (start_http_client) e chiuso allo shutdown
+# (close_http_client), così da riutilizzare le connessioni keep-alive tra le richieste.
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Endpoint di chat del runtime LLM, calcolato una sola volta all'import.
+_CHAT_URL = f"{API_BASE}/api/chat"
+
+# Header costanti delle richieste verso la chat API: il corpo è già serializzato da orjson
+# e inviato come `content=`, evitando il percorso di encoding JSON interno di httpx.
+_CHAT_HEADERS = {
+    "content-type": "application/json",
+    "accept": "application/json",
+}
+
+# Parte costante del payload della chat API del runtime LLM.
+# - `stream=False` richiede una risposta completa in un'unica risposta HTTP.
+# - `temperature` bassa per ridurre variabilità e favorire output strutturati (JSON).
+_BASE_CHAT_PAYLOAD: Dict[str, Any] = {
+    "model": MODEL_NAME,
+    "stream": False,
+    "options": {
+        "temperature": 0.1,
+    },
+}
+
+# Prompt di sistema costanti, costruiti una sola volta all'import.
+_SYSTEM_PROMPT_ESCALATION = (
+    "You are an AI assistant for an urban monitoring multi-agent system. "
+    "Your task is to decide whether a local monitoring agent should escalate "
+    "a situation to a city coordinator, based on recent sensor events in a district. "
+    "You MUST answer strictly in JSON following the schema: "
+    '{"escalate": true or false, "normalized_severity": "low|medium|high", '
+    '"reason": "short explanation"}. '
+    "Do not include any explanation outside of the JSON object."
+)
+
+_SYSTEM_PROMPT_COORDINATION = (
+    "You are a coordination planner for an urban multi-agent system. "
+    "A district has raised a critical event, and you must propose a coordination "
+    "plan involving other districts. "
+    "You MUST answer strictly in JSON following the schema: "
+    '{"plan": [ {"target_district": "name", "action_type": "ACTION_CODE", '
+    '"reason": "short explanation"} ] }. '
+    "The target_district must always be different from the source district. "
+    "Do not include any explanation outside of the JSON object."
+)
+
+
+# Limiti sulla dimensione dell'input inserito nel prompt.
+# La latenza di inferenza cresce con il numero di token del prompt: si conservano al più
+# _MAX_PROMPT_LIST_ITEMS elementi delle liste di contesto (i più recenti, in coda) e un
+# JSON di al più _MAX_PROMPT_PAYLOAD_CHARS caratteri.
+_MAX_PROMPT_LIST_ITEMS = 20
+_MAX_PROMPT_PAYLOAD_CHARS = 8192
+
+# Campi esclusi dal JSON inserito nel prompt (formato `exclude` di Pydantic).
+# I timestamp degli eventi non entrano nelle regole di decisione indicate al modello e
+# l'ordine di recent_events esprime già la recenza: escluderli accorcia il prompt e rende
+# la chiave di cache indipendente dall'istante di ricezione di letture altrimenti identiche.
+_ESCALATION_PROMPT_EXCLUDE: Dict[str, Any] = {
+    "current_event": {"timestamp"},
+    "recent_events": {"__all__": {"timestamp"}},
+}
+_COORDINATION_PROMPT_EXCLUDE: Dict[str, Any] = {
+    "critical_event": {"timestamp"},
+}
+
+# Lunghezza massima della rappresentazione dell'output grezzo inclusa nei messaggi di errore.
+_MAX_ERROR_RAW_CHARS = 512
+
+# Cache LRU delle risposte LLM già estratte.
+# Chiave: (tipo di richiesta, payload JSON serializzato dal modello di richiesta).
+# Valore: (istante di scadenza su orologio monotono, risposta estratta).
+# L'accesso avviene solo dall'event loop del gateway, quindi non serve sincronizzazione.
+_response_cache: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+# Chiamate al modello in corso, indicizzate con la stessa chiave della cache.
+# Il runtime LLM elabora una richiesta alla volta (o pochi slot paralleli): le richieste
+# identiche che arrivano mentre la prima è in attesa ne attendono il risultato invece
+# di accodare un'ulteriore inferenza.
+_inflight: Dict[Tuple[str, str], "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+def _cache_key(kind: str, payload_json: str) -> Tuple[str, str]:
+    """
+    Costruisce la chiave di cache per una richiesta LLM.
+
+    Args:
+        kind: Tipo di richiesta (es. "decide_escalation", "plan_coordination").
+        payload_json: Payload della richiesta serializzato dal modello Pydantic; l'ordine
+            dei campi è fissato dallo schema, quindi payload uguali producono la stessa stringa.
+
+    Returns:
+        Tuple[str, str]: Chiave hashable della richiesta.
+    """
+    return kind, payload_json
+
 
-from .config import settings
+def _cache_get(key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    Restituisce la risposta in cache per la chiave indicata, aggiornandone la recenza.
+
+    Le voci oltre CACHE_TTL_SECONDS sono considerate scadute e rimosse alla lettura.
+
+    Args:
+        key: Chiave prodotta da _cache_key.
 
+    Returns:
+        Optional[Dict[str, Any]]: Risposta memorizzata, oppure None in caso di miss.
+    """
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return value
+
+
+def _cache_put(key: Tuple[str, str], value: Dict[str, Any]) -> None:
+    """
+    Memorizza una risposta in cache, rimuovendo la voce meno recente oltre CACHE_SIZE.
 
-def _call_ollama_chat(system_prompt: str, user_prompt: str) -> str:
+    Args:
+        key: Chiave prodotta da _cache_key.
+        value: Risposta LLM già estratta come dizionario.
+    """
+    if CACHE_SIZE <= 0:
+        return
+    _response_cache[key] = (time.monotonic() + CACHE_TTL_SECONDS, value)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+def _bounded_payload_json(
+    body: BaseModel,
+    list_field: str,
+    exclude: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Serializza la richiesta per il prompt, limitandone la dimensione.
+
+    La lista di contesto indicata (es. recent_events, city_state) viene troncata agli
+    ultimi _MAX_PROMPT_LIST_ITEMS elementi; se il JSON risultante supera comunque
+    _MAX_PROMPT_PAYLOAD_CHARS, si rimuovono progressivamente gli elementi meno recenti.
+
+    I campi lasciati al valore di default (es. other_metrics vuoto, indici None) sono
+    omessi: non aggiungono informazione per il modello e allungano il prompt.
+
+    Args:
+        body: Richiesta validata da inserire nel prompt.
+        list_field: Nome del campo lista di contesto che può essere ridotto.
+        exclude: Campi (anche annidati) da non serializzare, nel formato `exclude` di Pydantic.
+
+    Returns:
+        str: JSON formattato (indent=2, senza campi di default) della richiesta, entro i
+        limiti previsti.
+
+    Raises:
+        HTTPException:
+            - 413 se il payload eccede il limite anche senza elementi di contesto.
+    """
+    items = getattr(body, list_field)
+    if len(items) > _MAX_PROMPT_LIST_ITEMS:
+        items = items[-_MAX_PROMPT_LIST_ITEMS:]
+        body = body.model_copy(update={list_field: items})
+
+    payload_json = body.model_dump_json(indent=2, exclude_defaults=True, exclude=exclude)
+    while len(payload_json) > _MAX_PROMPT_PAYLOAD_CHARS:
+        if not items:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=(
+                    f"Payload troppo grande per il prompt LLM "
+                    f"({len(payload_json)} > {_MAX_PROMPT_PAYLOAD_CHARS} caratteri)."
+                ),
+            )
+        items = items[1:]
+        body = body.model_copy(update={list_field: items})
+        payload_json = body.model_dump_json(indent=2, exclude_defaults=True, exclude=exclude)
+
+    return payload_json
+
+
+async def start_http_client() -> None:
     """
-    Effettua una chiamata sincrona all'endpoint di chat del runtime LLM.
+    Inizializza il client HTTP asincrono condiviso verso il runtime LLM.
+
+    Invocata dall'handler di startup dell'applicazione FastAPI.
+    """
+    _get_http_client()
+
+
+async def close_http_client() -> None:
+    """
+    Chiude il client HTTP asincrono condiviso, rilasciando le connessioni aperte.
+
+    Invocata dall'handler di shutdown dell'applicazione FastAPI.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Restituisce il client HTTP condiviso, creandolo se l'handler di startup non è stato eseguito
+    (es. uso del modulo al di fuori dell'applicazione FastAPI).
+
+    Returns:
+        httpx.AsyncClient: Client asincrono verso il runtime LLM.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        )
+    return _http_client
+
+
+async def _call_ollama_chat(system_prompt: str, user_prompt: str) -> str:
+    """
+    Effettua una chiamata asincrona all'endpoint di chat del runtime LLM.
 
     La funzione costruisce un payload compatibile con l'API /api/chat del runtime
     (es. Ollama) e restituisce la risposta testuale (`message.content`) del modello.
@@ -55,28 +302,22 @@ def _call_ollama_chat(system_prompt: str, user_prompt: str) -> str:
             - 503 in caso di errore di connessione / timeout / rete verso il runtime LLM.
             - 502 in caso di status non-200, JSON non valido, o struttura risposta inattesa.
     """
-    # Normalizzazione del base URL per evitare doppi "/" nella composizione dell'endpoint.
-    base_url = str(settings.api_base).rstrip("/")
-    url = f"{base_url}/api/chat"
-
-    # Payload conforme alla chat API del runtime LLM.
-    # - `stream=False` richiede una risposta completa in un'unica risposta HTTP.
-    # - `temperature` bassa per ridurre variabilità e favorire output strutturati (JSON).
+    # Payload conforme alla chat API del runtime LLM: parte costante + messaggi della richiesta.
     payload: Dict[str, Any] = {
-        "model": settings.model_name,
+        **_BASE_CHAT_PAYLOAD,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt},
         ],
-        "stream": False,
-        "options": {
-            "temperature": 0.1,
-        },
     }
 
     try:
-        resp = requests.post(url, json=payload, timeout=settings.timeout_seconds)
-    except requests.RequestException as exc:
+        resp = await _get_http_client().post(
+            _CHAT_URL,
+            content=orjson.dumps(payload),
+            headers=_CHAT_HEADERS,
+        )
+    except httpx.HTTPError as exc:
         # Errori di rete, timeout, DNS, connessione rifiutata, ecc.:
         # il gateway non può soddisfare la richiesta perché la dipendenza esterna è indisponibile.
         raise HTTPException(
@@ -92,8 +333,8 @@ def _call_ollama_chat(system_prompt: str, user_prompt: str) -> str:
         )
 
     try:
-        data = resp.json()
-    except json.JSONDecodeError as exc:
+        data = orjson.loads(resp.content)
+    except orjson.JSONDecodeError as exc:
         # Il runtime ha risposto con contenuto non JSON: il gateway non può interpretare la risposta.
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -113,6 +354,71 @@ def _call_ollama_chat(system_prompt: str, user_prompt: str) -> str:
     return content
 
 
+def truncate_raw(obj: Any, limit: int = _MAX_ERROR_RAW_CHARS) -> str:
+    """
+    Rappresentazione troncata dell'output grezzo del modello, per i messaggi di errore.
+
+    Le risposte non conformi possono essere lunghe: nel detail dell'errore ne basta
+    l'inizio per il debug dei prompt, senza restituire al client l'intero output.
+
+    Args:
+        obj: Testo o oggetto decodificato restituito dal modello.
+        limit: Numero massimo di caratteri della rappresentazione.
+
+    Returns:
+        str: repr(obj), troncata a `limit` caratteri con "..." finale se più lunga.
+    """
+    text = repr(obj)
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
+def _find_first_json_object(text: str) -> Optional[str]:
+    """
+    Individua il primo oggetto JSON bilanciato all'interno di un testo.
+
+    La scansione è a passata singola: a partire dalla prima '{' tiene traccia della
+    profondità delle parentesi graffe, ignorando quelle contenute in stringhe JSON
+    (con gestione dei caratteri di escape), e si interrompe appena la profondità
+    torna a zero.
+
+    Args:
+        text: Testo grezzo restituito dal modello.
+
+    Returns:
+        Optional[str]: Sottostringa contenente il primo oggetto bilanciato, oppure None
+        se nel testo non è presente alcun oggetto completo.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start : i + 1]
+
+    # Oggetto aperto ma mai chiuso (es. risposta troncata).
+    return None
+
+
 def _extract_json_from_text(text: str) -> Dict[str, Any]:
     """
     Estrae un oggetto JSON da una risposta testuale del modello.
@@ -120,8 +426,10 @@ def _extract_json_from_text(text: str) -> Dict[str, Any]:
     Motivazione
     -----------
     Anche imponendo "strictly in JSON" nel prompt, alcuni modelli possono
-    aggiungere testo extra. Questa funzione cerca quindi la prima '{' e l'ultima '}'
-    per isolare la porzione JSON e decodificarla.
+    aggiungere testo extra prima o dopo l'oggetto. Se il testo non è già un oggetto JSON
+    valido, questa funzione isola il primo oggetto JSON bilanciato (vedi
+    _find_first_json_object) e lo decodifica, senza includere eventuale testo o
+    parentesi presenti dopo la sua chiusura.
 
     Args:
         text: Testo grezzo restituito dal modello.
@@ -133,29 +441,128 @@ def _extract_json_from_text(text: str) -> Dict[str, Any]:
         HTTPException:
             - 502 se non viene individuato un oggetto JSON oppure se il JSON è invalido.
     """
-    # Ricerca euristica dei delimitatori JSON nella risposta.
-    start = text.find("{")
-    end = text.rfind("}")
-    if start == -1 or end == -1 or end <= start:
+    # Caso comune: il modello rispetta il vincolo e restituisce solo l'oggetto JSON.
+    # Il parsing diretto (orjson) evita la scansione carattere per carattere in Python.
+    try:
+        data = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        return data
+
+    # Isolamento della sottostringa candidata a JSON.
+    json_str = _find_first_json_object(text)
+    if json_str is None:
         # Nessuna porzione JSON identificabile: l'LLM non ha rispettato il vincolo richiesto.
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Nessun JSON individuato nella risposta del modello: {text!r}",
+            detail=f"Nessun JSON individuato nella risposta del modello: {truncate_raw(text)}",
         )
 
-    # Isolamento della sottostringa candidata a JSON.
-    json_str = text[start : end + 1]
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError as exc:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError as exc:
         # JSON sintatticamente non valido: errore imputabile all'output del modello.
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"JSON non valido nella risposta del modello: {exc} | raw={json_str!r}",
+            detail=f"JSON non valido nella risposta del modello: {exc} | raw={truncate_raw(json_str)}",
         ) from exc
 
 
-def call_llm_for_decide_escalation(payload: Dict[str, Any]) -> Dict[str, Any]:
+# Validatore della risposta estratta: restituisce il dizionario conforme allo schema
+# dell'endpoint oppure solleva HTTPException se la risposta non è utilizzabile.
+ResponseValidator = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+async def _call_model(
+    key: Tuple[str, str],
+    system_prompt: str,
+    user_prompt: str,
+    validate: ResponseValidator,
+) -> Dict[str, Any]:
+    """
+    Interroga il modello, estrae e valida l'oggetto JSON e lo memorizza in cache.
+
+    La validazione precede la scrittura in cache: una risposta non conforme solleva
+    l'errore del validatore e non viene memorizzata.
+
+    Args:
+        key: Chiave di cache della richiesta.
+        system_prompt: Prompt di sistema.
+        user_prompt: Prompt utente con il payload serializzato.
+        validate: Validatore della risposta estratta.
+
+    Returns:
+        Dict[str, Any]: Risposta del modello già validata.
+    """
+    raw_text = await _call_ollama_chat(system_prompt, user_prompt)
+    result = validate(_extract_json_from_text(raw_text))
+    _cache_put(key, result)
+    return result
+
+
+def _release_inflight(key: Tuple[str, str], future: "asyncio.Future[Dict[str, Any]]") -> None:
+    """
+    Callback di completamento di una chiamata condivisa: la rimuove da quelle in corso.
+
+    Recupera anche l'eventuale eccezione: se tutti i client in attesa si sono disconnessi
+    (la chiamata prosegue grazie a shield), nessuno la leggerebbe e asyncio segnalerebbe
+    "Task exception was never retrieved" per un errore già gestito (timeout, 502, 503).
+
+    Args:
+        key: Chiave di cache della chiamata.
+        future: Task della chiamata condivisa, completato.
+    """
+    _inflight.pop(key, None)
+    if not future.cancelled():
+        future.exception()
+
+
+async def _call_model_shared(
+    key: Tuple[str, str],
+    system_prompt: str,
+    user_prompt: str,
+    use_cache: bool,
+    validate: ResponseValidator,
+) -> Dict[str, Any]:
+    """
+    Restituisce la risposta del modello, riusando cache e chiamate identiche in corso.
+
+    Con use_cache=False la richiesta non legge la cache né si aggancia a chiamate in
+    corso: interroga sempre il modello (il risultato aggiorna comunque la cache).
+
+    Args:
+        key: Chiave di cache della richiesta.
+        system_prompt: Prompt di sistema.
+        user_prompt: Prompt utente con il payload serializzato.
+        use_cache: Se False, forza una nuova inferenza.
+        validate: Validatore della risposta estratta (vedi _call_model).
+
+    Returns:
+        Dict[str, Any]: Risposta del modello già validata.
+    """
+    if not use_cache:
+        return await _call_model(key, system_prompt, user_prompt, validate)
+
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_call_model(key, system_prompt, user_prompt, validate))
+        _inflight[key] = pending
+        pending.add_done_callback(lambda f: _release_inflight(key, f))
+
+    # shield: la disconnessione di un client non annulla la chiamata condivisa dagli altri.
+    return await asyncio.shield(pending)
+
+
+async def call_llm_for_decide_escalation(
+    body: schemas.DecideEscalationRequest,
+    validate: ResponseValidator,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
     """
     Richiede al modello la decisione di escalation di un evento di distretto.
 
@@ -169,20 +576,19 @@ def call_llm_for_decide_escalation(payload: Dict[str, Any]) -> Dict[str, Any]:
       }
 
     Args:
-        payload: Dizionario contenente distretto, eventi recenti e evento corrente.
+        body: Richiesta validata contenente distretto, eventi recenti e evento corrente.
+        validate: Validatore della risposta (conformità a DecideEscalationResponse),
+            applicato prima della scrittura in cache.
+        use_cache: Se False, ignora cache e chiamate in corso e interroga sempre il modello.
 
     Returns:
-        Dict[str, Any]: Dizionario con decisione di escalation e severità normalizzata.
-    """
-    system_prompt = (
-        "You are an AI assistant for an urban monitoring multi-agent system. "
-        "Your task is to decide whether a local monitoring agent should escalate "
-        "a situation to a city coordinator, based on recent sensor events in a district. "
-        "You MUST answer strictly in JSON following the schema: "
-        '{"escalate": true or false, "normalized_severity": "low|medium|high", '
-        '"reason": "short explanation"}. '
-        "Do not include any explanation outside of the JSON object."
-    )
+        Dict[str, Any]: Dizionario validato con decisione di escalation e severità normalizzata.
+    """
+    # Il modello validato viene serializzato una sola volta (pydantic-core, senza dict
+    # intermedio da model_dump) con limite di dimensione: usato sia come chiave di cache
+    # sia nel prompt.
+    payload_json = _bounded_payload_json(body, "recent_events", _ESCALATION_PROMPT_EXCLUDE)
+    key = _cache_key("decide_escalation", payload_json)
 
     # Il payload viene inserito nel prompt come JSON formattato per migliorare leggibilità
     # e ridurre ambiguità interpretativa da parte del modello.
@@ -190,14 +596,19 @@ def call_llm_for_decide_escalation(payload: Dict[str, Any]) -> Dict[str, Any]:
         "Here is the JSON input describing the district, recent events and the current event.\n"
         "Analyze the situation and decide if an escalation is needed.\n"
         "Input JSON:\n"
-        f"{json.dumps(payload, indent=2)}"
+        f"{payload_json}"
     )
 
-    raw_text = _call_ollama_chat(system_prompt, user_prompt)
-    return _extract_json_from_text(raw_text)
+    return await _call_model_shared(
+        key, _SYSTEM_PROMPT_ESCALATION, user_prompt, use_cache, validate
+    )
 
 
-def call_llm_for_plan_coordination(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def call_llm_for_plan_coordination(
+    body: schemas.PlanCoordinationRequest,
+    validate: ResponseValidator,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
     """
     Richiede al modello un piano di coordinamento inter-distrettuale.
 
@@ -218,21 +629,16 @@ def call_llm_for_plan_coordination(payload: Dict[str, Any]) -> Dict[str, Any]:
     - target_district deve essere sempre diverso dal distretto sorgente.
 
     Args:
-        payload: Dizionario contenente distretto sorgente, evento critico e stato sintetico città.
+        body: Richiesta validata con distretto sorgente, evento critico e stato sintetico città.
+        validate: Validatore della risposta (conformità a PlanCoordinationResponse),
+            applicato prima della scrittura in cache.
+        use_cache: Se False, ignora cache e chiamate in corso e interroga sempre il modello.
 
     Returns:
-        Dict[str, Any]: Dizionario contenente una lista di azioni di coordinamento suggerite.
-    """
-    system_prompt = (
-        "You are a coordination planner for an urban multi-agent system. "
-        "A district has raised a critical event, and you must propose a coordination "
-        "plan involving other districts. "
-        "You MUST answer strictly in JSON following the schema: "
-        '{"plan": [ {"target_district": "name", "action_type": "ACTION_CODE", '
-        '"reason": "short explanation"} ] }. '
-        "The target_district must always be different from the source district. "
-        "Do not include any explanation outside of the JSON object."
-    )
+        Dict[str, Any]: Dizionario validato contenente una lista di azioni di coordinamento.
+    """
+    payload_json = _bounded_payload_json(body, "city_state", _COORDINATION_PROMPT_EXCLUDE)
+    key = _cache_key("plan_coordination", payload_json)
 
     # Il prompt fornisce contesto e vincoli, mentre l'input è espresso come JSON serializzato.
     user_prompt = (
@@ -240,8 +646,9 @@ def call_llm_for_plan_coordination(payload: Dict[str, Any]) -> Dict[str, Any]:
         "and a synthetic view of the city state.\n"
         "Propose a coordination plan as a JSON object.\n"
         "Input JSON:\n"
-        f"{json.dumps(payload, indent=2)}"
+        f"{payload_json}"
     )
 
-    raw_text = _call_ollama_chat(system_prompt, user_prompt)
-    return _extract_json_from_text(raw_text)
\ No newline at end of file
+    return await _call_model_shared(
+        key, _SYSTEM_PROMPT_COORDINATION, user_prompt, use_cache, validate
+    )
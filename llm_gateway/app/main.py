@@ -12,34 +12,79 @@ Ruolo nel sistema
 -----------------
 Questo servizio funge da "gateway" controllato verso il runtime LLM:
 - riceve richieste validate via schemi Pydantic (schemas.*)
-- costruisce un payload dizionario da inoltrare al client LLM
+- inoltra al client LLM il modello di richiesta già validato
 - invoca il runtime LLM tramite llm_client
 - valida la risposta rispetto agli schemi di output attesi
 - in caso di risposta non conforme, produce un errore esplicito (HTTP 500) con raw payload
+- espone varianti interne (/llm/internal/*), protette da token condiviso, che per
+  client MAS fidati costruiscono la richiesta senza validazione completa
 
 Nota progettuale
 ----
 La validazione dell'output è intenzionalmente demandata agli schemi Pydantic:
 in tal modo, il sistema non accetta risposte non strutturate o fuori contratto,
 riducendo l'impatto di comportamenti non deterministici del modello.
+Gli endpoint LLM restituiscono direttamente una GatewayJSONResponse (orjson) costruita
+dal dizionario di risposta: il percorso in uscita è quindi dict -> orjson -> socket,
+senza jsonable_encoder né ulteriore lavoro Pydantic.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict
+import hmac
+from typing import Any, Dict, Optional
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, ValidationError
 
 from . import schemas
+from .config import CORS_ORIGINS, ENABLE_CORS, EXPOSE_DOCS, INTERNAL_TOKEN, TRUSTED_LLM_OUTPUT
 from .llm_client import (
     call_llm_for_decide_escalation,
     call_llm_for_plan_coordination,
+    close_http_client,
+    start_http_client,
+    truncate_raw,
 )
 
+
+def _orjson_default(obj: Any) -> Any:
+    """
+    Hook di serializzazione orjson per tipi non nativi.
+
+    Args:
+        obj: Oggetto non serializzabile direttamente da orjson.
+
+    Returns:
+        Any: Rappresentazione JSON-compatibile dell'oggetto (modelli Pydantic via model_dump).
+
+    Raises:
+        TypeError: se il tipo non è supportato (comportamento atteso da orjson).
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Tipo non serializzabile in JSON: {type(obj).__name__}")
+
+
+class GatewayJSONResponse(ORJSONResponse):
+    """
+    Risposta JSON serializzata con orjson, con supporto diretto ai modelli Pydantic
+    e a dizionari con chiavi non stringa.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
 # Istanza dell'applicazione FastAPI.
 # I metadati (title, description, version) migliorano la qualità della documentazione
 # OpenAPI auto-generata e la leggibilità dell'architettura per revisori e manutentori.
+# GatewayJSONResponse (orjson) come classe di risposta di default: serializzazione nativa
+# dei dizionari e dei modelli restituiti dagli endpoint.
 app = FastAPI(
     title="LLM Gateway for Urban MAS",
     description=(
@@ -47,24 +92,57 @@ app = FastAPI(
         "a un modello LLM eseguito in locale (es. Mistral 7B via Ollama)."
     ),
     version="0.1.0",
+    default_response_class=GatewayJSONResponse,
+    # Con LLM_GATEWAY_DISABLE_DOCS lo schema OpenAPI non viene mai generato.
+    openapi_url="/openapi.json" if EXPOSE_DOCS else None,
+    docs_url="/docs" if EXPOSE_DOCS else None,
+    redoc_url="/redoc" if EXPOSE_DOCS else None,
 )
 
-# Middleware CORS: consente l'accesso anche da dashboard/servizi web esterni al container.
-# In contesto di progetto accademico viene lasciato permissivo ("*") per semplicità di integrazione.
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Middleware CORS: necessario solo per client browser (es. dashboard esterne al container).
+# Il gateway è interno alla rete Docker e chiamato dal MAS via HTTP server-to-server, quindi
+# il middleware è installato solo su richiesta (LLM_GATEWAY_ENABLE_CORS), evitandone il costo
+# su ogni richiesta. Le credenziali non sono consentite; origin e header sono limitati a
+# quelli effettivamente usati (LLM_GATEWAY_CORS_ORIGINS, JSON body e token interno).
+if ENABLE_CORS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(CORS_ORIGINS),
+        allow_credentials=False,
+        allow_methods=["GET", "POST"],
+        allow_headers=["content-type", "x-internal"],
+    )
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+    """
+    Inizializza il client HTTP asincrono condiviso verso il runtime LLM.
+
+    Se la documentazione è esposta, lo schema OpenAPI viene generato qui (e memorizzato
+    da FastAPI in app.openapi_schema), così la prima richiesta a /docs non ne paga il costo.
+    """
+    await start_http_client()
+    if EXPOSE_DOCS:
+        app.openapi()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    """
+    Chiude il client HTTP condiviso, rilasciando le connessioni keep-alive.
+    """
+    await close_http_client()
 
 
 @app.get("/", include_in_schema=False)
-def root() -> Dict[str, str]:
+async def root() -> Dict[str, str]:
     """
     Endpoint di health/status minimale.
 
+    È dichiarato `async` come gli altri endpoint: non esegue I/O bloccante, quindi può
+    girare direttamente sull'event loop senza passare dal threadpool di Starlette.
+
     Returns:
         Dict[str, str]: Informazioni essenziali sul servizio, utili per smoke test e debug.
     """
@@ -75,77 +153,553 @@ def root() -> Dict[str, str]:
     }
 
 
-@app.post("/llm/decide_escalation", response_model=schemas.DecideEscalationResponse)
-def decide_escalation(body: schemas.DecideEscalationRequest) -> Any:
+# Validatori dei modelli di risposta (TypeAdapter precompilati in schemas), risolti una
+# sola volta all'import: usati nel ramo di fallback senza il dispatch di model_validate.
+_ESC_VALIDATOR = schemas.DECIDE_ESCALATION_RESPONSE_ADAPTER.validate_python
+_PLAN_VALIDATOR = schemas.PLAN_COORDINATION_RESPONSE_ADAPTER.validate_python
+
+# Valori di severità normalizzata attesi dal MAS (vincolati dal prompt del client LLM).
+_NORMALIZED_SEVERITIES = frozenset({"low", "medium", "high"})
+
+# Campi esposti nelle risposte, usati per la proiezione dell'output LLM fidato.
+_ESCALATION_FIELDS = ("escalate", "normalized_severity", "reason")
+_PLAN_ENTRY_FIELDS = ("target_district", "action_type", "reason")
+
+
+def _is_well_formed_escalation(raw: Dict[str, Any]) -> bool:
     """
-    Endpoint per la decisione di escalation di un evento di distretto.
+    Verifica economica della forma di una risposta di escalation.
 
-    Flusso
-    ------
-    1) Validazione input tramite DecideEscalationRequest (Pydantic).
-    2) Serializzazione in dict per passaggio al client LLM.
-    3) Invocazione del runtime LLM tramite call_llm_for_decide_escalation.
-    4) Validazione della risposta tramite DecideEscalationResponse.
+    Se la risposta supera il controllo, può essere restituita senza la pipeline di
+    validazione completa di Pydantic; in caso contrario si ricade
+    sul validatore dello schema, che produce l'errore dettagliato.
 
     Args:
-        body: Payload strutturato contenente informazioni su distretto ed eventi.
+        raw: Dizionario estratto dalla risposta dell'LLM.
+
+    Returns:
+        bool: True se tutti i campi attesi sono presenti con il tipo corretto.
+    """
+    return (
+        isinstance(raw.get("escalate"), bool)
+        and raw.get("normalized_severity") in _NORMALIZED_SEVERITIES
+        and isinstance(raw.get("reason"), str)
+    )
+
+
+def _is_well_formed_plan_entry(entry: Any) -> bool:
+    """
+    Verifica economica della forma di una singola entry di piano.
+
+    Args:
+        entry: Elemento della lista "plan" restituita dall'LLM.
+
+    Returns:
+        bool: True se l'entry è un dizionario con i tre campi testuali attesi.
+    """
+    return (
+        isinstance(entry, dict)
+        and isinstance(entry.get("target_district"), str)
+        and isinstance(entry.get("action_type"), str)
+        and isinstance(entry.get("reason"), str)
+    )
+
+
+# Parametri della decisione deterministica rapida (senza LLM):
+# - un evento corrente "high" è escalato direttamente se almeno
+#   _PERSISTENT_HIGH_MIN_COUNT degli ultimi _PERSISTENT_HIGH_WINDOW eventi recenti dello
+#   stesso tipo di sensore sono anch'essi "high" (criticità persistente);
+# - un evento corrente "low" non è escalato se nessun evento recente è "high".
+_PERSISTENT_HIGH_WINDOW = 3
+_PERSISTENT_HIGH_MIN_COUNT = 2
+
+# Corpi JSON delle due decisioni rapide, serializzati una sola volta all'import.
+_FAST_ESCALATE_BODY = orjson.dumps(
+    {
+        "escalate": True,
+        "normalized_severity": "high",
+        "reason": "fast_path_persistent_high_severity",
+    }
+)
+_FAST_NO_ESCALATE_BODY = orjson.dumps(
+    {
+        "escalate": False,
+        "normalized_severity": "low",
+        "reason": "fast_path_low_severity",
+    }
+)
+
+
+def _fast_decide(body: schemas.DecideEscalationRequest) -> Optional[bytes]:
+    """
+    Decide l'escalation in modo deterministico nei casi non ambigui.
+
+    Motivazione
+    -----------
+    Molte decisioni sono evidenti dai soli livelli di severità: inoltrarle al modello
+    costerebbe secondi di inferenza. Solo i casi ambigui proseguono verso l'LLM.
+
+    Args:
+        body: Richiesta di escalation validata.
 
     Returns:
-        Any: Oggetto validato conforme a DecideEscalationResponse.
+        Optional[bytes]: Corpo JSON pre-serializzato conforme a DecideEscalationResponse
+        se la decisione è certa, altrimenti None.
+    """
+    current = body.current_event
+    current_severity = current.severity.lower()
+
+    if current_severity == "high":
+        same_type = [e for e in body.recent_events if e.sensor_type == current.sensor_type]
+        window = same_type[-_PERSISTENT_HIGH_WINDOW:]
+        high_count = sum(1 for e in window if e.severity.lower() == "high")
+        if high_count >= _PERSISTENT_HIGH_MIN_COUNT:
+            return _FAST_ESCALATE_BODY
+    elif current_severity == "low":
+        if not any(e.severity.lower() == "high" for e in body.recent_events):
+            return _FAST_NO_ESCALATE_BODY
+
+    return None
+
+
+def _escalation_response(raw_response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Produce la risposta di escalation a partire dall'output estratto dall'LLM.
+
+    Args:
+        raw_response: Dizionario estratto dalla risposta del modello.
+
+    Returns:
+        Dict[str, Any]: Dizionario conforme a DecideEscalationResponse.
 
     Raises:
         HTTPException:
-            500 se la risposta dell'LLM non rispetta lo schema atteso, indicando
-            esplicitamente l'errore di validazione e il contenuto grezzo ricevuto.
+            500 se la risposta dell'LLM non rispetta lo schema atteso.
     """
-    # Conversione in dict per un payload JSON-serializzabile e indipendente dal modello Pydantic.
-    payload_dict: Dict[str, Any] = body.model_dump()
-    raw_response = call_llm_for_decide_escalation(payload_dict)
+    # Output fidato (LLM_TRUSTED_OUTPUT): sola proiezione dei campi, senza controlli di
+    # tipo; se un campo manca si ricade sulla validazione completa.
+    if TRUSTED_LLM_OUTPUT:
+        try:
+            return {name: raw_response[name] for name in _ESCALATION_FIELDS}
+        except (KeyError, TypeError):
+            pass
+
+    # Fast path: risposta già nella forma attesa, restituita senza rivalidazione completa.
+    if _is_well_formed_escalation(raw_response):
+        return {
+            "escalate": raw_response["escalate"],
+            "normalized_severity": raw_response["normalized_severity"],
+            "reason": raw_response["reason"],
+        }
 
     try:
         # Validazione "hard" dell'output: il sistema accetta solo risposte conformi allo schema.
-        return schemas.DecideEscalationResponse.model_validate(raw_response)
+        return _ESC_VALIDATOR(raw_response).model_dump()
     except Exception as exc:
         # L'errore viene riportato come 500 perché la risposta non è utilizzabile dal MAS.
-        # `raw_response` è incluso nel detail per facilitare debug e tuning dei prompt.
+        # L'inizio di `raw_response` è incluso nel detail per facilitare debug e tuning dei
+        # prompt (troncato: le risposte non conformi possono essere molto lunghe).
+        raise HTTPException(
+            status_code=500,
+            detail=f"Risposta LLM non valida per decide_escalation: {exc} | raw={truncate_raw(raw_response)}",
+        )
+
+
+def _plan_response(raw_response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Produce la risposta di coordinamento a partire dall'output estratto dall'LLM.
+
+    Args:
+        raw_response: Dizionario estratto dalla risposta del modello.
+
+    Returns:
+        Dict[str, Any]: Dizionario conforme a PlanCoordinationResponse.
+
+    Raises:
+        HTTPException:
+            500 se la risposta dell'LLM non rispetta lo schema atteso.
+    """
+    # Output fidato (LLM_TRUSTED_OUTPUT): proiezione delle entry senza i controlli per
+    # campo, che sono il costo dominante sui piani lunghi.
+    if TRUSTED_LLM_OUTPUT:
+        try:
+            return {
+                "plan": [
+                    {name: entry[name] for name in _PLAN_ENTRY_FIELDS}
+                    for entry in raw_response["plan"]
+                ]
+            }
+        except (KeyError, TypeError):
+            pass
+
+    # Fast path: piano già nella forma attesa, restituito senza rivalidazione completa.
+    plan = raw_response.get("plan")
+    if isinstance(plan, list) and all(_is_well_formed_plan_entry(entry) for entry in plan):
+        return {
+            "plan": [
+                {
+                    "target_district": entry["target_district"],
+                    "action_type": entry["action_type"],
+                    "reason": entry["reason"],
+                }
+                for entry in plan
+            ]
+        }
+
+    try:
+        # Validazione della struttura del piano per garantire che l'output sia consumabile
+        # dal CityCoordinatorAgent o da componenti equivalenti nel MAS.
+        return _PLAN_VALIDATOR(raw_response).model_dump()
+    except Exception as exc:
         raise HTTPException(
             status_code=500,
-            detail=f"Risposta LLM non valida per decide_escalation: {exc} | raw={raw_response!r}",
+            detail=f"Risposta LLM non valida per plan_coordination: {exc} | raw={truncate_raw(raw_response)}",
         )
 
 
-@app.post("/llm/plan_coordination", response_model=schemas.PlanCoordinationResponse)
-def plan_coordination(body: schemas.PlanCoordinationRequest) -> Any:
+# Nota: gli endpoint LLM dichiarano `response_model=None` e restituiscono una Response già
+# serializzata; lo schema di risposta resta documentato in OpenAPI tramite `responses`, ma
+# FastAPI non ripete validazione, jsonable_encoder e serializzazione.
+@app.post(
+    "/llm/decide_escalation",
+    response_model=None,
+    responses={200: {"model": schemas.DecideEscalationResponse}},
+)
+async def decide_escalation(
+    body: schemas.DecideEscalationRequest,
+    no_cache: bool = False,
+) -> Response:
+    """
+    Endpoint per la decisione di escalation di un evento di distretto.
+
+    Flusso
+    ------
+    1) Validazione input tramite DecideEscalationRequest (Pydantic).
+    2) Decisione deterministica immediata nei casi non ambigui (_fast_decide).
+    3) Altrimenti invocazione del runtime LLM tramite call_llm_for_decide_escalation.
+    4) Restituzione diretta della risposta se già ben formata, altrimenti
+       validazione tramite DecideEscalationResponse.
+
+    Args:
+        body: Payload strutturato contenente informazioni su distretto ed eventi.
+        no_cache: Query param opzionale; se True forza la chiamata al modello ignorando la cache.
+
+    Returns:
+        Response: Risposta JSON già serializzata, conforme a DecideEscalationResponse.
+
+    Raises:
+        HTTPException:
+            500 se la risposta dell'LLM non rispetta lo schema atteso, indicando
+            esplicitamente l'errore di validazione e il contenuto grezzo ricevuto.
+    """
+    # Casi non ambigui: decisione deterministica, senza interrogare il modello.
+    fast_body = _fast_decide(body)
+    if fast_body is not None:
+        return Response(content=fast_body, media_type="application/json")
+
+    # Il modello validato viene passato direttamente al client LLM, che lo serializza in JSON.
+    # La validazione della risposta avviene nel client LLM, prima della scrittura in cache.
+    response = await call_llm_for_decide_escalation(
+        body, validate=_escalation_response, use_cache=not no_cache
+    )
+    return GatewayJSONResponse(response)
+
+
+@app.post(
+    "/llm/plan_coordination",
+    response_model=None,
+    responses={200: {"model": schemas.PlanCoordinationResponse}},
+)
+async def plan_coordination(
+    body: schemas.PlanCoordinationRequest,
+    no_cache: bool = False,
+) -> Response:
     """
     Endpoint per la generazione di un piano di coordinamento inter-distrettuale.
 
     Flusso
     ------
     1) Validazione input tramite PlanCoordinationRequest (Pydantic).
-    2) Serializzazione in dict per passaggio al client LLM.
-    3) Invocazione del runtime LLM tramite call_llm_for_plan_coordination.
-    4) Validazione della risposta tramite PlanCoordinationResponse.
+    2) Invocazione del runtime LLM tramite call_llm_for_plan_coordination.
+    3) Restituzione diretta della risposta se già ben formata, altrimenti
+       validazione tramite PlanCoordinationResponse.
 
     Args:
         body: Payload strutturato con distretto sorgente, evento critico e stato sintetico città.
+        no_cache: Query param opzionale; se True forza la chiamata al modello ignorando la cache.
 
     Returns:
-        Any: Oggetto validato conforme a PlanCoordinationResponse.
+        Response: Risposta JSON già serializzata, conforme a PlanCoordinationResponse.
 
     Raises:
         HTTPException:
             500 se la risposta dell'LLM non rispetta lo schema atteso.
     """
-    # Conversione in dict per ottenere una struttura semplice e serializzabile.
-    payload_dict: Dict[str, Any] = body.model_dump()
-    raw_response = call_llm_for_plan_coordination(payload_dict)
+    # La validazione della risposta avviene nel client LLM, prima della scrittura in cache.
+    response = await call_llm_for_plan_coordination(
+        body, validate=_plan_response, use_cache=not no_cache
+    )
+    return GatewayJSONResponse(response)
+
+
+def _require_internal_token(x_internal: Optional[str]) -> None:
+    """
+    Verifica il token condiviso degli endpoint interni.
+
+    Il confronto è a tempo costante (hmac.compare_digest) per non esporre
+    informazioni sul token tramite il tempo di risposta.
+
+    Args:
+        x_internal: Valore dell'header X-Internal ricevuto.
+
+    Raises:
+        HTTPException:
+            - 404 se gli endpoint interni sono disabilitati (LLM_INTERNAL_TOKEN non impostato).
+            - 403 se il token è assente o non corrisponde.
+    """
+    if not INTERNAL_TOKEN:
+        raise HTTPException(status_code=404, detail="Endpoint interni non abilitati.")
+    if x_internal is None or not hmac.compare_digest(x_internal.encode(), INTERNAL_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token interno non valido.")
+
+
+# Campi testuali obbligatori di SensorEventSummary, controllati prima di model_construct.
+_SUMMARY_STR_FIELDS = ("timestamp", "sensor_type", "unit", "severity")
+_OPTIONAL_INDEX_FIELDS = ("traffic_index", "pollution_index")
+
+
+def _is_number(value: Any) -> bool:
+    """
+    Indica se un valore JSON è un numero (int o float, esclusi i bool).
+
+    Args:
+        value: Valore decodificato dal corpo della richiesta.
+
+    Returns:
+        bool: True se il valore può essere usato come float senza conversioni.
+    """
+    value_type = type(value)
+    return value_type is float or value_type is int
+
+
+def _checked_summary(event: Any) -> Dict[str, Any]:
+    """
+    Verifica la forma di un SensorEventSummary grezzo prima di model_construct.
+
+    model_construct non controlla né campi né tipi: un riepilogo incompleto o con tipi
+    errati arriverebbe a _fast_decide o alla costruzione del prompt e produrrebbe un 500.
+    Il controllo è volutamente stretto (nessuna coercizione): ciò che non passa viene
+    affidato alla validazione completa, che accetta le forme coercibili e restituisce 422
+    per le altre.
+
+    Args:
+        event: Riepilogo evento decodificato dal corpo della richiesta.
+
+    Returns:
+        Dict[str, Any]: Lo stesso dizionario, se ha la forma attesa.
+
+    Raises:
+        TypeError: se il riepilogo non è un dizionario o ha campi di tipo inatteso.
+        KeyError: se manca un campo obbligatorio.
+    """
+    if type(event) is not dict:
+        raise TypeError("Riepilogo evento non in formato dizionario")
+    for name in _SUMMARY_STR_FIELDS:
+        if type(event[name]) is not str:
+            raise TypeError(f"Campo {name} non testuale")
+    if not _is_number(event["value"]):
+        raise TypeError("Campo value non numerico")
+    return event
+
+
+def _checked_city_state_entry(entry: Any) -> Dict[str, Any]:
+    """
+    Verifica la forma di una CityStateEntry grezza prima di model_construct.
+
+    Args:
+        entry: Voce di stato decodificata dal corpo della richiesta.
+
+    Returns:
+        Dict[str, Any]: Lo stesso dizionario, se ha la forma attesa.
+
+    Raises:
+        TypeError: se la voce non è un dizionario o ha campi di tipo inatteso.
+        KeyError: se manca il distretto.
+    """
+    if type(entry) is not dict or type(entry["district"]) is not str:
+        raise TypeError("Voce di stato non valida")
+    for name in _OPTIONAL_INDEX_FIELDS:
+        value = entry.get(name)
+        if value is not None and not _is_number(value):
+            raise TypeError(f"Campo {name} non numerico")
+    other_metrics = entry.get("other_metrics", {})
+    if type(other_metrics) is not dict or not all(
+        _is_number(value) for value in other_metrics.values()
+    ):
+        raise TypeError("Campo other_metrics non valido")
+    return entry
+
+
+def _checked_list(items: Any) -> list:
+    """
+    Verifica che un campo lista del corpo sia effettivamente una lista.
+
+    Args:
+        items: Valore decodificato dal corpo della richiesta.
+
+    Returns:
+        list: Lo stesso valore, se è una lista.
+
+    Raises:
+        TypeError: se il valore non è una lista.
+    """
+    if type(items) is not list:
+        raise TypeError("Campo lista non valido")
+    return items
+
+
+def _construct_decide_escalation_request(data: Dict[str, Any]) -> schemas.DecideEscalationRequest:
+    """
+    Costruisce una DecideEscalationRequest senza validazione (client MAS fidato).
+
+    Args:
+        data: Corpo della richiesta già decodificato.
+
+    Returns:
+        schemas.DecideEscalationRequest: Istanza costruita tramite model_construct.
+
+    Raises:
+        KeyError, TypeError: se il corpo non ha la forma attesa (campi mancanti o di tipo
+        errato, anche nei riepiloghi annidati).
+    """
+    if type(data) is not dict or type(data["district"]) is not str:
+        raise TypeError("Corpo della richiesta non valido")
+    return schemas.DecideEscalationRequest.model_construct(
+        district=data["district"],
+        recent_events=[
+            schemas.SensorEventSummary.model_construct(**_checked_summary(event))
+            for event in _checked_list(data.get("recent_events", []))
+        ],
+        current_event=schemas.SensorEventSummary.model_construct(
+            **_checked_summary(data["current_event"])
+        ),
+    )
+
+
+def _construct_plan_coordination_request(data: Dict[str, Any]) -> schemas.PlanCoordinationRequest:
+    """
+    Costruisce una PlanCoordinationRequest senza validazione (client MAS fidato).
+
+    Args:
+        data: Corpo della richiesta già decodificato.
+
+    Returns:
+        schemas.PlanCoordinationRequest: Istanza costruita tramite model_construct.
+
+    Raises:
+        KeyError, TypeError: se il corpo non ha la forma attesa (campi mancanti o di tipo
+        errato, anche nei riepiloghi annidati).
+    """
+    if type(data) is not dict or type(data["source_district"]) is not str:
+        raise TypeError("Corpo della richiesta non valido")
+    return schemas.PlanCoordinationRequest.model_construct(
+        source_district=data["source_district"],
+        critical_event=schemas.SensorEventSummary.model_construct(
+            **_checked_summary(data["critical_event"])
+        ),
+        city_state=[
+            schemas.CityStateEntry.model_construct(**_checked_city_state_entry(entry))
+            for entry in _checked_list(data.get("city_state", []))
+        ],
+    )
+
+
+@app.post(
+    "/llm/internal/decide_escalation",
+    response_model=None,
+    responses={200: {"model": schemas.DecideEscalationResponse}},
+    include_in_schema=False,
+)
+async def internal_decide_escalation(
+    request: Request,
+    no_cache: bool = False,
+    x_internal: Optional[str] = Header(default=None),
+) -> Response:
+    """
+    Variante interna di /llm/decide_escalation per client MAS fidati.
+
+    Il corpo, prodotto da un client che ne garantisce già la forma, viene costruito
+    con model_construct senza la validazione completa, dopo un controllo stretto di
+    chiavi e tipi (anche dei riepiloghi annidati). Se il controllo o la costruzione
+    falliscono, si ricade sulla validazione tramite TypeAdapter precompilato: le forme
+    coercibili vengono accettate, le altre producono il consueto errore 422.
 
+    Args:
+        request: Richiesta HTTP grezza.
+        no_cache: Query param opzionale; se True forza la chiamata al modello ignorando la cache.
+        x_internal: Header X-Internal con il token condiviso.
+
+    Returns:
+        Response: Risposta JSON già serializzata, conforme a DecideEscalationResponse.
+    """
+    _require_internal_token(x_internal)
+    raw_body = await request.body()
     try:
-        # Validazione della struttura del piano per garantire che l'output sia consumabile
-        # dal CityCoordinatorAgent o da componenti equivalenti nel MAS.
-        return schemas.PlanCoordinationResponse.model_validate(raw_response)
-    except Exception as exc:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Risposta LLM non valida per plan_coordination: {exc} | raw={raw_response!r}",
-        )
\ No newline at end of file
+        body = _construct_decide_escalation_request(orjson.loads(raw_body))
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        try:
+            body = schemas.DECIDE_ESCALATION_REQUEST_ADAPTER.validate_json(raw_body)
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors()) from exc
+
+    fast_body = _fast_decide(body)
+    if fast_body is not None:
+        return Response(content=fast_body, media_type="application/json")
+
+    # La validazione della risposta avviene nel client LLM, prima della scrittura in cache.
+    response = await call_llm_for_decide_escalation(
+        body, validate=_escalation_response, use_cache=not no_cache
+    )
+    return GatewayJSONResponse(response)
+
+
+@app.post(
+    "/llm/internal/plan_coordination",
+    response_model=None,
+    responses={200: {"model": schemas.PlanCoordinationResponse}},
+    include_in_schema=False,
+)
+async def internal_plan_coordination(
+    request: Request,
+    no_cache: bool = False,
+    x_internal: Optional[str] = Header(default=None),
+) -> Response:
+    """
+    Variante interna di /llm/plan_coordination per client MAS fidati.
+
+    Stesso schema di /llm/internal/decide_escalation: costruzione senza validazione,
+    con ricaduta sul TypeAdapter precompilato se il corpo non ha la forma attesa.
+
+    Args:
+        request: Richiesta HTTP grezza.
+        no_cache: Query param opzionale; se True forza la chiamata al modello ignorando la cache.
+        x_internal: Header X-Internal con il token condiviso.
+
+    Returns:
+        Response: Risposta JSON già serializzata, conforme a PlanCoordinationResponse.
+    """
+    _require_internal_token(x_internal)
+    raw_body = await request.body()
+    try:
+        body = _construct_plan_coordination_request(orjson.loads(raw_body))
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        try:
+            body = schemas.PLAN_COORDINATION_REQUEST_ADAPTER.validate_json(raw_body)
+        except ValidationError as exc:
+            raise RequestValidationError(exc.errors()) from exc
+
+    # La validazione della risposta avviene nel client LLM, prima della scrittura in cache.
+    response = await call_llm_for_plan_coordination(
+        body, validate=_plan_response, use_cache=not no_cache
+    )
+    return GatewayJSONResponse(response)
@@ -19,13 +19,26 @@ Nota progettuale
 La presenza di schemi di risposta (ResponseModel) è particolarmente importante
 in un contesto LLM: l'output del modello può essere non deterministico o non
 conforme; la validazione blocca immediatamente risposte non strutturate.
+
+I TypeAdapter dei modelli di richiesta sono costruiti una sola volta all'import e
+consentono la validazione diretta da bytes JSON (parsing in pydantic-core); quelli dei
+modelli di risposta validano l'output LLM senza il dispatch di model_validate. Tutti
+vengono esercitati una volta all'import (_warm_up), fuori dal percorso delle richieste.
+
+Tutti i modelli condividono una configurazione immutabile (frozen) che ignora i campi
+extra: le istanze sono trattate come valori in sola lettura lungo la pipeline e le chiavi
+aggiuntive eventualmente prodotte dall'LLM vengono scartate senza errori.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
-from pydantic import BaseModel, Field
+
+# Configurazione comune agli schemi: istanze immutabili, campi sconosciuti ignorati.
+_SCHEMA_CONFIG = ConfigDict(extra="ignore", frozen=True)
 
 
 class SensorEventSummary(BaseModel):
@@ -35,7 +48,9 @@ class SensorEventSummary(BaseModel):
     Attributi
     ---------
     timestamp:
-        Timestamp dell'evento (formato stringa; es. ISO 8601).
+        Timestamp dell'evento (formato stringa; es. ISO 8601). Resta una stringa opaca:
+        il gateway non lo interpreta (lo inoltra solo nel prompt) e il MAS può inviare
+        una stringa vuota se il timestamp manca nel payload MQTT.
     sensor_type:
         Tipo di sensore o metrica (es. traffic, pollution, noise, ecc.).
     value:
@@ -46,6 +61,8 @@ class SensorEventSummary(BaseModel):
         Severità associata all'evento (valore testuale, tipicamente derivato
         da regole locali del MAS o dal layer di pre-processing).
     """
+    model_config = _SCHEMA_CONFIG
+
     timestamp: str
     sensor_type: str
     value: float
@@ -70,6 +87,8 @@ class CityStateEntry(BaseModel):
         della metrica e il valore è un float; utile per estendere il sistema senza
         modificare lo schema principale.
     """
+    model_config = _SCHEMA_CONFIG
+
     district: str
     traffic_index: Optional[float] = None
     pollution_index: Optional[float] = None
@@ -85,6 +104,8 @@ class DecideEscalationRequest(BaseModel):
     - una finestra di eventi recenti (contesto);
     - l'evento corrente da valutare (focus principale).
     """
+    model_config = _SCHEMA_CONFIG
+
     district: str
     recent_events: List[SensorEventSummary] = Field(default_factory=list)
     current_event: SensorEventSummary
@@ -97,6 +118,8 @@ class DecideEscalationResponse(BaseModel):
     Il gateway valida questa struttura per garantire che l'output possa essere
     consumato dagli agenti del MAS in modo deterministico.
     """
+    model_config = _SCHEMA_CONFIG
+
     escalate: bool
     normalized_severity: str = Field(
         ...,
@@ -114,6 +137,8 @@ class PlanCoordinationRequest(BaseModel):
     - evento critico (oggetto SensorEventSummary);
     - stato sintetico della città (lista di distretti con indicatori principali).
     """
+    model_config = _SCHEMA_CONFIG
+
     source_district: str
     critical_event: SensorEventSummary
     city_state: List[CityStateEntry] = Field(
@@ -136,6 +161,8 @@ class PlanEntry(BaseModel):
     reason:
         Motivazione sintetica della scelta.
     """
+    model_config = _SCHEMA_CONFIG
+
     target_district: str
     action_type: str
     reason: str
@@ -148,7 +175,56 @@ class PlanCoordinationResponse(BaseModel):
     Il piano è modellato come lista di PlanEntry per permettere la proposta di più
     azioni coordinate verso distretti diversi.
     """
+    model_config = _SCHEMA_CONFIG
+
     plan: List[PlanEntry] = Field(
         default_factory=list,
         description="Lista di azioni di coordinamento proposte dall'LLM.",
     )
+
+
+# TypeAdapter precompilati dei modelli di richiesta: validano direttamente il corpo
+# JSON grezzo (validate_json), senza passare da un dizionario Python intermedio.
+DECIDE_ESCALATION_REQUEST_ADAPTER: TypeAdapter[DecideEscalationRequest] = TypeAdapter(
+    DecideEscalationRequest
+)
+PLAN_COORDINATION_REQUEST_ADAPTER: TypeAdapter[PlanCoordinationRequest] = TypeAdapter(
+    PlanCoordinationRequest
+)
+
+# TypeAdapter precompilati dei modelli di risposta: usati dal gateway come validatori di
+# fallback dell'output LLM (validate_python su dizionario già estratto dal testo).
+DECIDE_ESCALATION_RESPONSE_ADAPTER: TypeAdapter[DecideEscalationResponse] = TypeAdapter(
+    DecideEscalationResponse
+)
+PLAN_COORDINATION_RESPONSE_ADAPTER: TypeAdapter[PlanCoordinationResponse] = TypeAdapter(
+    PlanCoordinationResponse
+)
+
+
+def _warm_up() -> None:
+    """
+    Esegue una validazione e una serializzazione di prova per ogni modello esposto.
+
+    Gli schemi sono già compilati alla definizione delle classi; il primo utilizzo reale
+    di validatori e serializer (modelli annidati inclusi) avviene però qui, all'import,
+    anziché durante la prima richiesta servita da ciascun worker.
+    """
+    event = {"timestamp": "", "sensor_type": "", "value": 0.0, "unit": "", "severity": "low"}
+    escalation = DECIDE_ESCALATION_REQUEST_ADAPTER.validate_python(
+        {"district": "", "recent_events": [event], "current_event": event}
+    )
+    plan_request = PLAN_COORDINATION_REQUEST_ADAPTER.validate_python(
+        {"source_district": "", "critical_event": event, "city_state": [{"district": ""}]}
+    )
+    escalation.model_dump_json(exclude_defaults=True)
+    plan_request.model_dump_json(exclude_defaults=True)
+    DECIDE_ESCALATION_RESPONSE_ADAPTER.validate_python(
+        {"escalate": False, "normalized_severity": "low", "reason": ""}
+    ).model_dump()
+    PLAN_COORDINATION_RESPONSE_ADAPTER.validate_python(
+        {"plan": [{"target_district": "", "action_type": "", "reason": ""}]}
+    ).model_dump()
+
+
+_warm_up()
@@ -25,26 +25,106 @@ Integrazioni
 
 Note progettuali
 ----------------
-- Gli agenti sono implementati come thread daemon, e comunicano tramite code thread-safe
-  (queue.Queue) per evitare accoppiamento diretto e favorire un modello event-driven.
-- Le code vengono usate in modalità non bloccante per l’invio (put_nowait) dove opportuno,
-  così da evitare blocchi sistemici in presenza di backlog.
+- Gli agenti sono implementati come thread daemon, e comunicano tramite buffer
+  thread-safe a capacità limitata (ring.RingBuffer) per evitare accoppiamento diretto e
+  favorire un modello event-driven.
+- Invio e ricezione sono non bloccanti (try_put / try_get), così da evitare blocchi
+  sistemici in presenza di backlog. In assenza di messaggi ogni agente si sospende su un
+  proprio Event ("campanello") suonato dai buffer in ingresso o da stop(): a riposo non
+  ci sono risvegli periodici.
+- Il modello a thread è mantenuto (invece di task asyncio su un unico event loop) perché
+  le operazioni bloccanti sono già fuori dal percorso critico degli agenti: le POST di
+  persistenza sono eseguite dal PersistenceWriter e le decisioni LLM di un lotto sono
+  richieste in parallelo sul pool di llm_client. Il client MQTT (paho) e il client HTTP
+  (requests) sono sincroni: un event loop richiederebbe comunque thread ponte per entrambi.
 """
 
 import logging
-import queue
+import sys
 import threading
-from dataclasses import dataclass, asdict
-from typing import Any, Dict, Dict as DictType, List
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Deque, Dict, Dict as DictType, FrozenSet, List, Optional, Tuple, Union
 
 from . import persistence
 from . import llm_client
+from .llm_client import EscalationDecision
+from .ring import RingBuffer
 
 # Logger di modulo: consente tracciamento consistente per agenti e componenti MAS.
 logger = logging.getLogger(__name__)
 
+# Numero massimo di eventi sensoriali prelevati per giro dal loop dell'agente di distretto.
+_SENSOR_BATCH_SIZE = 32
 
-@dataclass
+# Tipi di messaggio interni tra agenti (stringhe internate: le chiavi delle tabelle
+# di dispatch coincidono per identità con i msg_type dei messaggi costruiti qui).
+MSG_ESCALATION_REQUEST = sys.intern("ESCALATION_REQUEST")
+MSG_COORDINATION_COMMAND = sys.intern("COORDINATION_COMMAND")
+
+# Attesa massima di un agente di distretto per consegnare un'escalation con inbox piena.
+_ESCALATION_PUT_TIMEOUT_SECONDS = 0.5
+
+# Numero massimo di messaggi prelevati da ciascuna inbox di distretto per giro del
+# coordinatore: limita quanto un distretto molto attivo può ritardare gli altri.
+_COORDINATOR_INBOX_QUANTUM = 8
+
+# Severità (minuscole e internate) per cui l'agente consulta il gateway LLM.
+_LLM_SEVERITIES: FrozenSet[str] = frozenset(("medium", "high"))
+
+
+# Formato di log di un evento: la formattazione è differita al logging, quindi non viene
+# eseguita se il record è scartato per livello.
+_EVENT_LOG_FORMAT = "[%s] topic=%s | district=%s | type=%s | value=%s %s | severity=%s"
+# Formati completi precomposti: evitano la concatenazione a ogni evento.
+_CRITICAL_EVENT_LOG_FORMAT = "EVENTO CRITICO in %s (decisione LLM=%s): " + _EVENT_LOG_FORMAT
+_NON_CRITICAL_EVENT_LOG_FORMAT = "Evento non critico in %s (decisione LLM=%s): " + _EVENT_LOG_FORMAT
+
+
+def _event_log_args(event: "SensorEvent") -> Tuple[Any, ...]:
+    """
+    Argomenti di _EVENT_LOG_FORMAT per un evento (nessuna formattazione di stringhe).
+
+    Args:
+        event: Evento da tracciare nei log.
+
+    Returns:
+        Tuple[Any, ...]: Valori nell'ordine dei segnaposto del formato.
+    """
+    return (
+        event.timestamp,
+        event.topic,
+        event.district,
+        event.sensor_type,
+        event.value,
+        event.unit,
+        event.severity,
+    )
+
+
+# Cache severità grezza -> normalizzata usata da SensorEvent.from_raw. Il limite protegge
+# da payload con severità arbitrarie; oltre il limite si normalizza senza memorizzare.
+_SEVERITY_CACHE_MAX = 64
+_SEVERITY_CACHE: Dict[str, str] = {}
+
+
+def _normalize_severity(raw: Any) -> str:
+    """
+    Normalizza una severità in ingresso: stringa minuscola e internata.
+
+    Le severità assumono pochi valori distinti: l'interning fa sì che tutte le istanze
+    condividano la stessa stringa, rendendo i confronti successivi un confronto di puntatori.
+
+    Args:
+        raw: Valore grezzo (payload MQTT o risposta del gateway LLM).
+
+    Returns:
+        str: Severità normalizzata.
+    """
+    return sys.intern(str(raw).lower())
+
+
+@dataclass(slots=True, frozen=True)
 class SensorEvent:
     """
     Rappresentazione normalizzata di un evento sensoriale ricevuto via MQTT.
@@ -54,6 +134,12 @@ class SensorEvent:
     Convertire payload eterogenei (tipicamente JSON) in una struttura interna uniforme,
     facilmente serializzabile e persistibile.
 
+    Note progettuali
+    ----------------
+    Viene creata un'istanza per ogni messaggio MQTT: la dataclass usa __slots__ (niente
+    __dict__ per istanza) ed è immutabile, così da poter essere condivisa tra thread e
+    finestre di contesto senza copie difensive.
+
     Attributi
     ---------
     topic:
@@ -67,8 +153,8 @@ class SensorEvent:
     unit:
         Unità di misura associata al valore.
     severity:
-        Severità associata all'evento (es. low/medium/high); può essere aggiornata
-        (es. normalizzazione tramite LLM).
+        Severità associata all'evento (es. low/medium/high), sempre minuscola e internata;
+        l'eventuale normalizzazione tramite LLM produce una nuova istanza (dataclasses.replace).
     timestamp:
         Timestamp dell'evento (stringa; tipicamente ISO 8601 o formato equivalente).
     """
@@ -79,9 +165,20 @@ class SensorEvent:
     unit: str
     severity: str
     timestamp: str
+    # Flag derivato dalla severità, calcolato una sola volta alla costruzione.
+    critical: bool = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """
+        Calcola i campi derivati (anche per le istanze create con dataclasses.replace).
+        """
+        # La dataclass è frozen: l'assegnazione passa da object.__setattr__.
+        object.__setattr__(self, "critical", self.severity == "high")
 
     @classmethod
-    def from_raw(cls, topic: str, payload: Dict[str, Any]) -> "SensorEvent":
+    def from_raw(
+        cls, topic: str, payload: Dict[str, Any], district: Optional[str] = None
+    ) -> "SensorEvent":
         """
         Costruisce un SensorEvent a partire da un payload grezzo (tipicamente JSON).
 
@@ -94,18 +191,32 @@ class SensorEvent:
         Args:
             topic: Topic MQTT dell'evento.
             payload: Dizionario risultante dal parsing JSON del messaggio MQTT.
+            district: Distretto già ricavato dal chiamante (es. dal router); se None
+                viene letto dal payload.
 
         Returns:
             SensorEvent: Istanza normalizzata con valori di default ove necessario.
         """
+        # Metodo legato in variabile locale: un solo lookup di attributo per le letture.
+        get = payload.get
+
+        # Le severità grezze assumono pochi valori: la forma normalizzata viene presa da una
+        # cache limitata, evitando lower() e intern() per ogni messaggio.
+        raw_severity = get("severity", "unknown")
+        severity = _SEVERITY_CACHE.get(raw_severity) if type(raw_severity) is str else None
+        if severity is None:
+            severity = _normalize_severity(raw_severity)
+            if type(raw_severity) is str and len(_SEVERITY_CACHE) < _SEVERITY_CACHE_MAX:
+                _SEVERITY_CACHE[raw_severity] = severity
+
         return cls(
             topic=topic,
-            district=str(payload.get("district", "unknown")),
-            sensor_type=str(payload.get("type", "unknown")),
-            value=float(payload.get("value", 0.0)),
-            unit=str(payload.get("unit", "")),
-            severity=str(payload.get("severity", "unknown")),
-            timestamp=str(payload.get("timestamp", "")),
+            district=district if district is not None else str(get("district", "unknown")),
+            sensor_type=str(get("type", "unknown")),
+            value=float(get("value", 0.0)),
+            unit=str(get("unit", "")),
+            severity=severity,
+            timestamp=str(get("timestamp", "")),
         )
 
     def is_critical(self) -> bool:
@@ -118,9 +229,9 @@ class SensorEvent:
         disponibile o restituisca output non valido.
 
         Returns:
-            bool: True se la severità è "high" (case-insensitive), altrimenti False.
+            bool: True se la severità è "high", altrimenti False.
         """
-        return self.severity.lower() == "high"
+        return self.critical
 
     def to_dict(self) -> Dict[str, Any]:
         """
@@ -129,10 +240,19 @@ class SensorEvent:
         Returns:
             Dict[str, Any]: Rappresentazione dizionario (utile per persistenza e messaggistica).
         """
-        return asdict(self)
+        # Dict esplicito: evita la copia ricorsiva di dataclasses.asdict su campi tutti scalari.
+        return {
+            "topic": self.topic,
+            "district": self.district,
+            "sensor_type": self.sensor_type,
+            "value": self.value,
+            "unit": self.unit,
+            "severity": self.severity,
+            "timestamp": self.timestamp,
+        }
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     """
     Messaggio di controllo interno tra agenti (non MQTT).
@@ -140,7 +260,7 @@ class Message:
     Obiettivo
     ---------
     Modellare comunicazioni interne al MAS (es. escalation e comandi di coordinamento)
-    tramite code thread-safe (queue.Queue).
+    tramite buffer thread-safe (RingBuffer).
 
     Attributi
     ---------
@@ -152,12 +272,64 @@ class Message:
         Identificativo destinatario (distretto o "CityCoordinator").
     payload:
         Contenuto del messaggio (dizionari JSON-like).
+
+    Note progettuali
+    ----------------
+    I messaggi non escono dal processo: invece di allocarne uno nuovo per ogni escalation
+    o comando, i producer li ottengono con Message.acquire e i consumer li restituiscono
+    con Message.release dopo averli gestiti (free-list condivisa _MSG_POOL). Il payload
+    non viene riciclato, quindi i riferimenti ai suoi dict restano validi dopo il rilascio.
     """
     msg_type: str
     source: str
     target: str
     payload: Dict[str, Any]
 
+    @classmethod
+    def acquire(cls, msg_type: str, source: str, target: str, payload: Dict[str, Any]) -> "Message":
+        """
+        Restituisce un messaggio con i campi indicati, riusandone uno dalla free-list se possibile.
+
+        Args:
+            msg_type: Tipo di messaggio.
+            source: Identificativo sorgente.
+            target: Identificativo destinatario.
+            payload: Contenuto del messaggio.
+
+        Returns:
+            Message: Messaggio pronto per l'invio.
+        """
+        try:
+            msg = _MSG_POOL.pop()
+        except IndexError:
+            return cls(msg_type=msg_type, source=source, target=target, payload=payload)
+        msg.msg_type = msg_type
+        msg.source = source
+        msg.target = target
+        msg.payload = payload
+        return msg
+
+    @staticmethod
+    def release(msg: "Message") -> None:
+        """
+        Restituisce un messaggio gestito alla free-list.
+
+        Il chiamante non deve più usare il messaggio dopo il rilascio.
+
+        Args:
+            msg: Messaggio da riciclare.
+        """
+        # Il riferimento al payload viene rilasciato subito per non trattenerlo in memoria.
+        msg.payload = _EMPTY_PAYLOAD
+        _MSG_POOL.append(msg)
+
+
+# Free-list dei Message: deque con maxlen (append/pop atomici sotto GIL) condivisa dagli
+# agenti, dato che i messaggi passano da un agente all'altro.
+_MSG_POOL: Deque[Message] = deque(maxlen=1024)
+# Payload segnaposto dei messaggi in free-list (mai letto né modificato).
+_EMPTY_PAYLOAD: Dict[str, Any] = {}
+
 
 class DistrictMonitoringAgent(threading.Thread):
     """
@@ -177,9 +349,9 @@ class DistrictMonitoringAgent(threading.Thread):
     def __init__(
         self,
         district: str,
-        sensor_queue: "queue.Queue[SensorEvent]",
-        control_queue: "queue.Queue[Message]",
-        coordinator_inbox: "queue.Queue[Message]",
+        sensor_queue: "RingBuffer[SensorEvent]",
+        control_queue: "RingBuffer[Message]",
+        coordinator_inbox: "RingBuffer[Message]",
     ) -> None:
         # Thread daemon per garantire che la chiusura del processo non resti bloccata su agenti.
         super().__init__(name=f"DistrictAgent-{district}", daemon=True)
@@ -192,9 +364,26 @@ class DistrictMonitoringAgent(threading.Thread):
         self._running = threading.Event()
         self._running.set()
 
-        # Buffer di contesto: eventi recenti (sliding window) utilizzati per decisione LLM.
-        self._recent_events: List[SensorEvent] = []
+        # Campanello: suonato dai buffer sensoriale e di controllo a ogni inserimento e da
+        # stop(); il loop vi attende quando entrambi i buffer sono vuoti.
+        self._wakeup = threading.Event()
+        sensor_queue.set_doorbell(self._wakeup)
+        control_queue.set_doorbell(self._wakeup)
+
+        # Escalation scartate per inbox del coordinatore piena (diagnostica nei log).
+        self._dropped_escalations = 0
+
+        # Buffer di contesto: sintesi JSON-like degli eventi recenti (sliding window) usate per
+        # la decisione LLM. Sono costruite una sola volta all'inserimento nella finestra: il
+        # contesto per l'LLM è una copia superficiale della deque, che con maxlen scarta
+        # automaticamente la sintesi più vecchia.
         self._max_recent_events: int = 20
+        self._recent_summaries: Deque[Dict[str, Any]] = deque(maxlen=self._max_recent_events)
+
+        # Tabella di dispatch dei messaggi di controllo per tipo.
+        self._control_dispatch: DictType[str, Callable[[Message], None]] = {
+            MSG_COORDINATION_COMMAND: self._handle_coordination_command,
+        }
 
     def run(self) -> None:
         """
@@ -203,21 +392,29 @@ class DistrictMonitoringAgent(threading.Thread):
         Flusso
         ------
         - Processa eventuali messaggi di controllo (non bloccante).
-        - Attende eventi sensoriali con timeout (per permettere stop responsivo).
-        - Gestisce l'evento: persistenza, decisione escalation, eventuale invio al coordinatore.
+        - Preleva un lotto di eventi sensoriali (non bloccante).
+        - Gestisce gli eventi in ordine: persistenza, decisione escalation, eventuale invio
+          al coordinatore.
+        - Se non ci sono né eventi né comandi, attende il campanello senza timeout.
         """
         logger.info("Agente di quartiere %s avviato.", self._district)
         while self._running.is_set():
-            # Gestione dei comandi ricevuti dal coordinatore (non deve bloccare).
-            self._process_control_messages()
-
-            try:
-                # Attesa di un evento sensoriale con timeout: evita deadlock su stop.
-                event = self._sensor_queue.get(timeout=0.5)
-            except queue.Empty:
+            # Gestione dei comandi ricevuti dal coordinatore, con priorità sugli eventi:
+            # il controllo di lunghezza evita qualsiasi operazione sul buffer se è vuoto.
+            if len(self._control_queue):
+                self._process_control_messages()
+
+            events = self._drain_sensor_batch()
+            if events:
+                self._handle_sensor_batch(events)
                 continue
 
-            self._handle_sensor_event(event)
+            # Azzeramento e ricontrollo prima dell'attesa: un inserimento avvenuto nel
+            # frattempo o trova il campanello azzerato (e lo suona) o è visto qui.
+            self._wakeup.clear()
+            if len(self._sensor_queue) or len(self._control_queue):
+                continue
+            self._wakeup.wait()
 
     def stop(self) -> None:
         """
@@ -225,11 +422,29 @@ class DistrictMonitoringAgent(threading.Thread):
 
         Nota
         ----
-        Il loop `run()` verifica periodicamente `_running.is_set()` e usa timeout sulle get(),
-        quindi lo stop è responsivo senza necessità di segnali esterni.
+        Il campanello viene suonato dopo aver azzerato `_running`, così un loop in attesa
+        si risveglia subito e termina.
         """
         logger.info("Richiesta di arresto per l'agente di quartiere %s...", self._district)
         self._running.clear()
+        self._wakeup.set()
+
+    def _drain_sensor_batch(self, max_batch: int = _SENSOR_BATCH_SIZE) -> List[SensorEvent]:
+        """
+        Preleva dal buffer sensoriale fino a `max_batch` eventi disponibili.
+
+        Motivazione
+        -----------
+        Sotto carico, prelevare gli eventi a lotti ammortizza su più eventi il costo del
+        giro del loop (controllo dei comandi, verifica dello stop, attesa a vuoto).
+
+        Args:
+            max_batch: Numero massimo di eventi per lotto.
+
+        Returns:
+            List[SensorEvent]: Eventi in ordine di arrivo (lista vuota se non ce ne sono).
+        """
+        return self._sensor_queue.drain(max_batch)
 
     def _process_control_messages(self) -> None:
         """
@@ -237,91 +452,197 @@ class DistrictMonitoringAgent(threading.Thread):
 
         Motivazione
         -----------
-        Si usa `get_nowait()` in loop per evitare blocchi: i comandi di coordinamento
-        devono essere gestiti "opportunisticamente" mentre si continua a consumare sensori.
+        I messaggi presenti vengono prelevati in un'unica operazione non bloccante: i comandi
+        di coordinamento sono gestiti "opportunisticamente" mentre si continua a consumare
+        sensori, e il loop non paga un try_get a vuoto (con eccezione interna) per terminare.
+        """
+        for msg in self._control_queue.drain(len(self._control_queue)):
+            self._handle_control_message(msg)
+            Message.release(msg)
+
+    @staticmethod
+    def _summarize(event: SensorEvent) -> Dict[str, Any]:
+        """
+        Sintesi JSON-like di un evento, nel formato atteso dal gateway LLM.
+
+        Args:
+            event: Evento sensoriale da sintetizzare.
+
+        Returns:
+            Dict[str, Any]: Dizionario conforme a SensorEventSummary del gateway.
         """
+        # value è già float (SensorEvent.from_raw): nessuna conversione ulteriore.
+        return {
+            "timestamp": event.timestamp,
+            "sensor_type": event.sensor_type,
+            "value": event.value,
+            "unit": event.unit,
+            "severity": event.severity,
+        }
+
+    def _handle_sensor_batch(self, events: List[SensorEvent]) -> None:
+        """
+        Gestisce un lotto di eventi sensoriali prelevati insieme dal buffer.
+
+        Motivazione
+        -----------
+        Le decisioni LLM dominano la latenza dell'agente: invece di una chiamata bloccante
+        per evento, le richieste degli eventi medium/high del lotto vengono inviate al
+        gateway in parallelo (llm_client.submit_escalation_batch), pagando circa un solo
+        round-trip per lotto; durante l'attesa i comandi di controllo continuano a essere
+        gestiti. Gli eventi vengono poi gestiti in ordine di arrivo.
+
+        Nota
+        ----
+        Il contesto di ciascun evento è la finestra degli eventi precedenti, inclusi quelli
+        del lotto stesso; per questi ultimi la severità è quella originale, non ancora
+        normalizzata dall'LLM.
+
+        Args:
+            events: Eventi in ordine di arrivo.
+        """
+        llm_results, summaries = self._prefetch_llm_decisions(events)
+        for event, llm_result, summary in zip(events, llm_results, summaries):
+            self._handle_sensor_event(event, llm_result, summary)
+
+    def _prefetch_llm_decisions(
+        self, events: List[SensorEvent]
+    ) -> Tuple[List[Union[EscalationDecision, Exception, None]], List[Dict[str, Any]]]:
+        """
+        Richiede al gateway LLM, in un'unica tornata, le decisioni per gli eventi del lotto.
+
+        Args:
+            events: Eventi del lotto in ordine di arrivo.
+
+        Returns:
+            Tuple[List[Union[EscalationDecision, Exception, None]], List[Dict[str, Any]]]:
+            per ciascun evento, la risposta del gateway, l'eccezione ottenuta oppure None se
+            l'evento non richiede l'LLM; e la sintesi dell'evento, costruita una sola volta
+            e poi riusata per la finestra di contesto.
+        """
+        results: List[Union[EscalationDecision, Exception, None]] = [None] * len(events)
+        summaries: List[Dict[str, Any]] = []
+        positions: List[int] = []
+        requests_batch: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]] = []
+
+        # Finestra di contesto simulata lungo il lotto: sintesi già in memoria seguite da
+        # quelle degli eventi del lotto che precedono l'evento corrente.
+        window: List[Dict[str, Any]] = list(self._recent_summaries)
+        for i, event in enumerate(events):
+            summary = self._summarize(event)
+            summaries.append(summary)
+            if event.severity in _LLM_SEVERITIES:
+                positions.append(i)
+                requests_batch.append((window[-self._max_recent_events:], summary))
+            window.append(summary)
+
+        if requests_batch:
+            decisions = self._await_llm_decisions(requests_batch)
+            for i, decision in zip(positions, decisions):
+                results[i] = decision
+        return results, summaries
+
+    def _await_llm_decisions(
+        self, requests_batch: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]
+    ) -> List[Union[EscalationDecision, Exception]]:
+        """
+        Attende le decisioni LLM del lotto continuando a gestire i comandi di controllo.
+
+        Motivazione
+        -----------
+        Una richiesta al gateway può durare secondi: invece di bloccare il thread sulla
+        risposta, l'agente attende sul proprio campanello, suonato sia dal buffer di
+        controllo sia dal completamento di ciascuna richiesta, e nel frattempo esegue i
+        comandi di coordinamento in arrivo.
+
+        Args:
+            requests_batch: Coppie (recent_events, current_event), una per evento.
+
+        Returns:
+            List[Union[EscalationDecision, Exception]]: Risposte (o eccezioni) nello stesso ordine.
+        """
+        futures = llm_client.submit_escalation_batch(self._district, requests_batch)
+        for future in futures:
+            future.add_done_callback(self._ring_wakeup)
+
         while True:
-            try:
-                msg: Message = self._control_queue.get_nowait()
-            except queue.Empty:
+            # Azzeramento prima dei controlli: un completamento o un comando successivi
+            # suonano di nuovo il campanello e interrompono l'attesa.
+            self._wakeup.clear()
+            if len(self._control_queue):
+                self._process_control_messages()
+                continue
+            if all(future.done() for future in futures):
                 break
-            self._handle_control_message(msg)
+            self._wakeup.wait()
 
-    def _handle_sensor_event(self, event: SensorEvent) -> None:
+        return llm_client.collect_escalation_results(futures)
+
+    def _ring_wakeup(self, _future: Any) -> None:
+        """
+        Callback di completamento delle richieste LLM: risveglia il loop dell'agente.
+
+        Args:
+            _future: Future completata (non utilizzata).
+        """
+        self._wakeup.set()
+
+    def _handle_sensor_event(
+        self,
+        event: SensorEvent,
+        llm_result: Union[EscalationDecision, Exception, None] = None,
+        summary: Optional[Dict[str, Any]] = None,
+    ) -> None:
         """
         Gestisce un singolo evento sensoriale.
 
         Passi principali
         ----------------
         1) Log e persistenza dell'evento.
-        2) Costruzione del contesto (recent_events + current_event) in formato JSON-like.
-        3) Decisione escalation:
-           - consultazione LLM per severità medium/high;
+        2) Decisione escalation:
+           - per severità medium/high, uso della decisione LLM già richiesta per il lotto;
            - fallback deterministico in caso di errore/indisponibilità.
-        4) In caso di escalation, invio del messaggio al CityCoordinator tramite inbox queue.
-        5) Aggiornamento della sliding window degli eventi recenti.
+        3) In caso di escalation, invio del messaggio al CityCoordinator tramite inbox.
+        4) Aggiornamento della sliding window degli eventi recenti.
 
         Args:
             event: Evento sensoriale normalizzato proveniente dal listener MQTT.
+            llm_result: Risposta del gateway LLM per l'evento, oppure l'eccezione ottenuta
+                nella richiesta (None per eventi che non richiedono l'LLM).
+            summary: Sintesi dell'evento già costruita per il lotto (None: viene costruita qui).
         """
-        # Messaggio base per logging: utile per tracciamento e correlazione.
-        base_msg = (
-            f"[{event.timestamp}] topic={event.topic} | "
-            f"district={event.district} | type={event.sensor_type} | "
-            f"value={event.value} {event.unit} | severity={event.severity}"
-        )
-
         # Persistenza evento sensoriale: consente consultazione storica e dashboarding.
         event_dict = event.to_dict()
         persistence.persist_sensor_event(event_dict)
 
-        # Preparazione del contesto per l'LLM:
-        # - recent_summaries: finestra scorrevole di eventi precedenti (contesto)
-        # - current_summary: evento corrente (focus)
-        recent_summaries = [
-            {
-                "timestamp": e.timestamp,
-                "sensor_type": e.sensor_type,
-                "value": float(e.value),
-                "unit": e.unit,
-                "severity": e.severity,
-            }
-            for e in self._recent_events
-        ]
-        current_summary = {
-            "timestamp": event.timestamp,
-            "sensor_type": event.sensor_type,
-            "value": float(event.value),
-            "unit": event.unit,
-            "severity": event.severity,
-        }
-
         # Strategia di uso LLM:
         # - per eventi low, si evita costo/latency e si usa regola deterministica;
         # - per medium/high, si richiede normalizzazione e decisione più informata.
-        use_llm = event.severity.lower() in {"medium", "high"}
+        # La severità è già minuscola e internata (SensorEvent.from_raw): nessun .lower().
+        normalized_severity = event.severity
+        use_llm = normalized_severity in _LLM_SEVERITIES
 
         escalate: bool
         reason: str
-        normalized_severity = event.severity.lower()
 
         if use_llm:
             try:
-                # Invocazione del gateway LLM per decidere escalation e normalizzare severità.
-                llm_response = llm_client.decide_escalation(
-                    district=self._district,
-                    recent_events=recent_summaries,
-                    current_event=current_summary,
-                )
-                # Lettura robusta dei campi per evitare crash su output parziale.
-                escalate = bool(llm_response.get("escalate", False))
-                normalized_severity = str(
-                    llm_response.get("normalized_severity", normalized_severity)
-                ).lower()
-                reason = str(llm_response.get("reason", "llm_decision"))
-
-                # Aggiornamento dell'evento con severità normalizzata per coerenza di sistema.
-                event.severity = normalized_severity
+                # Decisione del gateway LLM (escalation e severità normalizzata), richiesta
+                # per l'intero lotto; un errore della richiesta ricade nel fallback.
+                if llm_result is None:
+                    raise ValueError("decisione LLM non disponibile")
+                if isinstance(llm_result, Exception):
+                    raise llm_result
+                # Decisione già validata e tipizzata da llm_client.
+                escalate = llm_result.escalate
+                normalized_severity = _normalize_severity(llm_result.normalized_severity)
+                reason = llm_result.reason
+
+                # Nuova istanza con severità normalizzata (SensorEvent è immutabile).
+                event = replace(event, severity=normalized_severity)
+                # Il dict già serializzato viene riallineato invece di essere ricostruito:
+                # persist_sensor_event ne ha copiato i campi al momento dell'accodamento.
+                event_dict["severity"] = normalized_severity
                 logger.info(
                     "Decisione LLM per %s: escalate=%s, normalized_severity=%s, reason=%s",
                     self._district,
@@ -347,40 +668,48 @@ class DistrictMonitoringAgent(threading.Thread):
         if escalate:
             # Logging in warning per evidenziare eventi critici/escalation nel flusso di log.
             logger.warning(
-                "EVENTO CRITICO in %s (decisione LLM=%s): %s",
+                _CRITICAL_EVENT_LOG_FORMAT,
                 self._district,
                 use_llm,
-                base_msg,
+                *_event_log_args(event),
             )
-            escalation_msg = Message(
-                msg_type="ESCALATION_REQUEST",
+            escalation_msg = Message.acquire(
+                msg_type=MSG_ESCALATION_REQUEST,
                 source=self._district,
                 target="CityCoordinator",
-                payload={"event": event.to_dict(), "reason": reason},
+                payload={"event": event_dict, "reason": reason},
             )
-            try:
-                # Invio non bloccante: evita che un backlog sul coordinatore blocchi l'agente locale.
-                self._coordinator_inbox.put_nowait(escalation_msg)
+            # Invio con attesa limitata: con inbox piena l'agente rallenta (e con lui il
+            # consumo del proprio buffer sensoriale) invece di scartare subito l'escalation.
+            if self._coordinator_inbox.put_wait(escalation_msg, _ESCALATION_PUT_TIMEOUT_SECONDS):
                 logger.info("Inviata ESCALATION_REQUEST da %s al CityCoordinator.", self._district)
-            except queue.Full:
-                # La coda del coordinatore è satura: l'escalation non viene consegnata.
-                # In un sistema reale si potrebbe introdurre retry/backoff o una DLQ.
+            else:
+                # La coda del coordinatore è rimasta satura: l'escalation non viene consegnata.
+                self._dropped_escalations += 1
                 logger.error(
-                    "Coda inbox CityCoordinator piena, impossibile inviare escalation da %s.",
+                    "Coda inbox CityCoordinator piena, impossibile inviare escalation da %s "
+                    "(escalation scartate finora: %d).",
                     self._district,
+                    self._dropped_escalations,
                 )
-        else:
+                Message.release(escalation_msg)
+        elif logger.isEnabledFor(logging.INFO):
+            # Percorso più frequente: con INFO disabilitato non si costruiscono gli argomenti.
             logger.info(
-                "Evento non critico in %s (decisione LLM=%s): %s",
+                _NON_CRITICAL_EVENT_LOG_FORMAT,
                 self._district,
                 use_llm,
-                base_msg,
+                *_event_log_args(event),
             )
 
         # Aggiornamento contesto eventi recenti (sliding window).
-        self._recent_events.append(event)
-        if len(self._recent_events) > self._max_recent_events:
-            self._recent_events.pop(0)
+        # La sintesi del lotto viene riusata, riallineando la severità se normalizzata
+        # dall'LLM: le richieste che la includevano sono già concluse.
+        if summary is None:
+            summary = self._summarize(event)
+        elif summary["severity"] is not event.severity:
+            summary["severity"] = event.severity
+        self._recent_summaries.append(summary)
 
     def _handle_control_message(self, msg: Message) -> None:
         """
@@ -393,16 +722,9 @@ class DistrictMonitoringAgent(threading.Thread):
         Args:
             msg: Messaggio di controllo ricevuto tramite control_queue.
         """
-        if msg.msg_type == "COORDINATION_COMMAND":
-            # Lettura dei campi: 'action' identifica l'azione da intraprendere.
-            action = msg.payload.get("action", "unknown")
-            from_district = msg.payload.get("from_district", "unknown")
-            logger.info(
-                "Agente di %s ha ricevuto COORDINATION_COMMAND: action=%s, from_district=%s",
-                self._district,
-                action,
-                from_district,
-            )
+        handler = self._control_dispatch.get(msg.msg_type)
+        if handler is not None:
+            handler(msg)
         else:
             # Messaggi non previsti vengono loggati per diagnosi e possibili estensioni future.
             logger.info(
@@ -412,6 +734,23 @@ class DistrictMonitoringAgent(threading.Thread):
                 msg.source,
             )
 
+    def _handle_coordination_command(self, msg: Message) -> None:
+        """
+        Gestisce un COORDINATION_COMMAND inviato dal CityCoordinator.
+
+        Args:
+            msg: Comando di coordinamento ricevuto tramite control_queue.
+        """
+        # Lettura dei campi: 'action' identifica l'azione da intraprendere.
+        action = msg.payload.get("action", "unknown")
+        from_district = msg.payload.get("from_district", "unknown")
+        logger.info(
+            "Agente di %s ha ricevuto COORDINATION_COMMAND: action=%s, from_district=%s",
+            self._district,
+            action,
+            from_district,
+        )
+
 
 class CityCoordinatorAgent(threading.Thread):
     """
@@ -419,51 +758,86 @@ class CityCoordinatorAgent(threading.Thread):
 
     Responsabilità
     --------------
-    - Riceve richieste di escalation dai distretti (inbox_queue).
+    - Riceve richieste di escalation dai distretti, una inbox per distretto.
     - Mantiene uno stato sintetico della città (city_state) per supportare decisioni.
     - Richiede al gateway LLM un piano di coordinamento inter-distrettuale oppure
       usa un piano deterministico di fallback.
     - Invia comandi di coordinamento ai distretti tramite le rispettive control queues.
     - Persiste le azioni intraprese (persistence.persist_action) per tracciabilità e dashboard.
+
+    Note progettuali
+    ----------------
+    Ogni distretto scrive su una propria inbox (un solo producer e un solo consumer per
+    buffer) invece che su una inbox centrale condivisa da tutti gli agenti: il coordinatore
+    le visita a turno (round-robin), prelevando al più _COORDINATOR_INBOX_QUANTUM messaggi
+    per inbox a ogni giro.
     """
 
     def __init__(
         self,
-        inbox_queue: "queue.Queue[Message]",
-        district_control_queues: DictType[str, "queue.Queue[Message]"],
+        district_inboxes: DictType[str, "RingBuffer[Message]"],
+        district_control_queues: DictType[str, "RingBuffer[Message]"],
     ) -> None:
         super().__init__(name="CityCoordinatorAgent", daemon=True)
-        self._inbox_queue = inbox_queue
+        # Lista fissa per il round-robin: evita di ricostruire la vista del dict a ogni giro.
+        self._district_inboxes: List["RingBuffer[Message]"] = list(district_inboxes.values())
         self._district_control_queues = district_control_queues
 
         # Flag di esecuzione per stop cooperativo.
         self._running = threading.Event()
         self._running.set()
 
-        # Stato sintetico della città: mapping distretto -> metriche (traffic_index, pollution_index, ...).
+        # Campanello condiviso da tutte le inbox: il coordinatore vi attende quando sono vuote.
+        self._wakeup = threading.Event()
+        for inbox in self._district_inboxes:
+            inbox.set_doorbell(self._wakeup)
+
+        # Tabella di dispatch dei messaggi in ingresso per tipo.
+        self._dispatch: DictType[str, Callable[[Message], None]] = {
+            MSG_ESCALATION_REQUEST: self._handle_escalation_request,
+        }
+
+        # Piani di fallback precalcolati per distretto sorgente: l'insieme dei distretti è
+        # fisso, quindi le entry sono costanti. La chiave None copre sorgenti non note.
+        self._fallback_plans: DictType[Optional[str], Tuple[Dict[str, Any], ...]] = {
+            source: self._materialize_fallback_plan(source)
+            for source in [None, *self._district_control_queues]
+        }
+
+        # Stato sintetico della città: mapping distretto -> voce city_state nel formato del gateway.
         self._city_state: DictType[str, Dict[str, Any]] = {}
 
     def run(self) -> None:
         """
         Main loop del coordinatore.
 
-        Attende messaggi in ingresso dalla inbox queue con timeout, così da mantenere
-        responsività allo stop.
+        Visita le inbox dei distretti in round-robin prelevando i messaggi in modo non
+        bloccante; se tutte le inbox sono vuote attende il campanello senza timeout.
         """
         logger.info("CityCoordinatorAgent avviato.")
         while self._running.is_set():
-            try:
-                msg: Message = self._inbox_queue.get(timeout=1.0)
-            except queue.Empty:
+            handled = 0
+            for inbox in self._district_inboxes:
+                for msg in inbox.drain(_COORDINATOR_INBOX_QUANTUM):
+                    self._handle_message(msg)
+                    Message.release(msg)
+                    handled += 1
+            if handled:
                 continue
-            self._handle_message(msg)
+
+            # Azzeramento e ricontrollo prima dell'attesa (vedi DistrictMonitoringAgent.run).
+            self._wakeup.clear()
+            if any(len(inbox) for inbox in self._district_inboxes):
+                continue
+            self._wakeup.wait()
 
     def stop(self) -> None:
         """
-        Richiede l'arresto cooperativo del coordinatore.
+        Richiede l'arresto cooperativo del coordinatore, risvegliando il loop in attesa.
         """
         logger.info("Richiesta di arresto per CityCoordinatorAgent...")
         self._running.clear()
+        self._wakeup.set()
 
     def _handle_message(self, msg: Message) -> None:
         """
@@ -472,8 +846,9 @@ class CityCoordinatorAgent(threading.Thread):
         Args:
             msg: Messaggio ricevuto in inbox (es. escalation).
         """
-        if msg.msg_type == "ESCALATION_REQUEST":
-            self._handle_escalation_request(msg)
+        handler = self._dispatch.get(msg.msg_type)
+        if handler is not None:
+            handler(msg)
         else:
             logger.info(
                 "CityCoordinatorAgent ha ricevuto messaggio di tipo %s da %s",
@@ -489,12 +864,22 @@ class CityCoordinatorAgent(threading.Thread):
         -----------
         Il coordinatore mantiene una vista minimale (traffic_index/pollution_index)
         per fornire contesto all'LLM durante la pianificazione di coordinamento.
+        Ogni voce ha già la forma attesa dal gateway (CityStateEntry) e viene aggiornata
+        sul posto: a ogni escalation il payload city_state è una semplice lista delle voci.
 
         Args:
             district: Distretto sorgente dell'evento.
             event: Snapshot dell'evento (dict) da cui estrarre sensor_type e value.
         """
-        state = self._city_state.setdefault(district, {})
+        state = self._city_state.get(district)
+        if state is None:
+            state = {
+                "district": district,
+                "traffic_index": None,
+                "pollution_index": None,
+                "other_metrics": {},
+            }
+            self._city_state[district] = state
         sensor_type = event.get("sensor_type") or event.get("type")
         raw_value = event.get("value", 0.0)
         try:
@@ -508,33 +893,50 @@ class CityCoordinatorAgent(threading.Thread):
         elif sensor_type == "pollution":
             state["pollution_index"] = value
 
-    def _build_fallback_plan(self, source_district: str, critical_event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def _materialize_fallback_plan(self, source_district: Optional[str]) -> Tuple[Dict[str, Any], ...]:
         """
-        Costruisce un piano deterministico di fallback in assenza di LLM.
+        Costruisce le entry del piano di fallback per un distretto sorgente.
 
         Strategia
         ---------
         In caso di escalation da un distretto, tutti gli altri distretti ricevono
         un'azione generica di supporto (es. REROUTE_TRAFFIC).
 
+        Args:
+            source_district: Distretto che ha generato l'escalation (None: nessuno escluso).
+
+        Returns:
+            Tuple[Dict[str, Any], ...]: Entry di piano coerenti con lo schema LLM.
+        """
+        return tuple(
+            {
+                "target_district": district,
+                "action_type": "REROUTE_TRAFFIC",
+                "reason": "support_escalation_fallback",
+            }
+            for district in self._district_control_queues
+            if district != source_district
+        )
+
+    def _build_fallback_plan(
+        self, source_district: str, critical_event: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], ...]:
+        """
+        Restituisce il piano deterministico di fallback in assenza di LLM.
+
+        Le entry sono precalcolate in __init__ e condivise tra le chiamate: i chiamanti
+        le leggono senza modificarle.
+
         Args:
             source_district: Distretto che ha generato l'escalation.
             critical_event: Evento critico normalizzato (non usato direttamente nel piano attuale).
 
         Returns:
-            List[Dict[str, Any]]: Lista di entry di piano coerenti con lo schema LLM.
+            Tuple[Dict[str, Any], ...]: Entry di piano coerenti con lo schema LLM.
         """
-        plan: List[Dict[str, Any]] = []
-        for district in self._district_control_queues.keys():
-            if district == source_district:
-                continue
-            plan.append(
-                {
-                    "target_district": district,
-                    "action_type": "REROUTE_TRAFFIC",
-                    "reason": "support_escalation_fallback",
-                }
-            )
+        plan = self._fallback_plans.get(source_district)
+        if plan is None:
+            plan = self._fallback_plans[None]
         return plan
 
     def _handle_escalation_request(self, msg: Message) -> None:
@@ -581,17 +983,8 @@ class CityCoordinatorAgent(threading.Thread):
             "severity": str(event.get("severity", "unknown")),
         }
 
-        # Costruzione payload city_state da inviare al gateway LLM.
-        city_state_payload: List[Dict[str, Any]] = []
-        for district_name, metrics in self._city_state.items():
-            city_state_payload.append(
-                {
-                    "district": district_name,
-                    "traffic_index": metrics.get("traffic_index"),
-                    "pollution_index": metrics.get("pollution_index"),
-                    "other_metrics": {},
-                }
-            )
+        # Payload city_state da inviare al gateway LLM: le voci sono già nel formato atteso.
+        city_state_payload: List[Dict[str, Any]] = list(self._city_state.values())
 
         try:
             # Invocazione LLM: produce un piano di coordinamento inter-distrettuale.
@@ -612,6 +1005,11 @@ class CityCoordinatorAgent(threading.Thread):
             plan_entries = self._build_fallback_plan(source_district, critical_event)
 
         # Traduzione delle entry di piano in comandi da inviare alle code dei distretti.
+        control_queues = self._district_control_queues
+        # Payload dei comandi per tipo di azione: identico per tutti i distretti target con la
+        # stessa azione, viene costruito una sola volta e condiviso (i destinatari lo leggono
+        # soltanto).
+        command_payloads: Dict[str, Dict[str, Any]] = {}
         for entry in plan_entries:
             target = entry.get("target_district")
             action_type = entry.get("action_type", "UNKNOWN_ACTION")
@@ -620,7 +1018,9 @@ class CityCoordinatorAgent(threading.Thread):
             # Validazioni minime:
             # - target esiste e non coincide con la sorgente
             # - target deve essere un distretto noto (presente nelle control queues)
-            if not target or target == source_district or target not in self._district_control_queues:
+            # Un solo lookup: la control queue trovata è riusata per l'invio.
+            control_queue = control_queues.get(target) if target else None
+            if control_queue is None or target == source_district:
                 logger.warning(
                     "Entry di piano con target_district non valido: %s (entry=%s)",
                     target,
@@ -628,20 +1028,22 @@ class CityCoordinatorAgent(threading.Thread):
                 )
                 continue
 
-            command = Message(
-                msg_type="COORDINATION_COMMAND",
-                source="CityCoordinator",
-                target=target,
-                payload={
+            payload = command_payloads.get(action_type)
+            if payload is None:
+                payload = {
                     "action": action_type,
                     "from_district": source_district,
                     "original_event": event,
-                },
+                }
+                command_payloads[action_type] = payload
+            command = Message.acquire(
+                msg_type=MSG_COORDINATION_COMMAND,
+                source="CityCoordinator",
+                target=target,
+                payload=payload,
             )
-            try:
-                # Invio non bloccante del comando: evita blocchi del coordinatore su code sature.
-                control_queue = self._district_control_queues[target]
-                control_queue.put_nowait(command)
+            # Invio non bloccante del comando: evita blocchi del coordinatore su code sature.
+            if control_queue.try_put(command):
                 logger.info(
                     "CityCoordinatorAgent ha inviato COORDINATION_COMMAND a %s per supportare %s (action=%s).",
                     target,
@@ -656,8 +1058,9 @@ class CityCoordinatorAgent(threading.Thread):
                     reason=reason,
                     event_snapshot=event,
                 )
-            except queue.Full:
+            else:
                 logger.error(
                     "Coda controllo per distretto %s piena, impossibile inviare comando di coordinamento.",
                     target,
-                )
\ No newline at end of file
+                )
+                Message.release(command)
\ No newline at end of file
@@ -26,12 +26,26 @@ Variabili d'ambiente
     Base URL del backend web per persistenza e API (default: "http://web-backend:8000").
 - LLM_GATEWAY_URL:
     Base URL del gateway LLM (default: "http://llm-gateway:8000").
+- LLM_INTERNAL_TOKEN:
+    Token condiviso con il gateway LLM; se impostato, il MAS usa gli endpoint
+    /llm/internal/* (header X-Internal) invece di quelli pubblici (default: vuoto).
+- LLM_CONNECT_TIMEOUT_SECONDS:
+    Timeout di connessione verso il gateway LLM (default: 1.0).
+- LLM_READ_TIMEOUT_SECONDS:
+    Timeout di lettura della risposta del gateway LLM (default: 5.0); oltre questa soglia
+    gli agenti applicano il fallback deterministico.
+- PERSIST_LOW_SEVERITY_INTERVAL_SECONDS:
+    Se > 0, gli eventi "low" consecutivi dello stesso (distretto, sensore) sono persistiti
+    al più una volta per intervallo; il cambio di severità è sempre persistito
+    (default: 0, ogni evento è persistito).
 
 Note progettuali
 ----------------
 - I valori di default sono coerenti con i nomi dei servizi definiti in docker-compose,
   facilitando l'esecuzione out-of-the-box.
 - Il topic filter MQTT usa wildcard per ricevere eventi da qualunque distretto e tipo sensore.
+- Le base URL dei servizi sono normalizzate una sola volta qui (senza '/' finale), così i
+  moduli client compongono gli endpoint per semplice concatenazione.
 """
 
 import os
@@ -53,7 +67,23 @@ DISTRICTS = ["quartiere1", "quartiere2"]
 
 # --- Endpoint servizi esterni -------------------------------------------------
 # Backend web responsabile di persistenza e API per dashboard/consultazione.
-WEB_BACKEND_URL: str = os.getenv("WEB_BACKEND_URL", "http://web-backend:8000")
+WEB_BACKEND_URL: str = os.getenv("WEB_BACKEND_URL", "http://web-backend:8000").rstrip("/")
 
 # Gateway LLM utilizzato per decisioni assistite (escalation, coordination planning).
-LLM_GATEWAY_URL: str = os.getenv("LLM_GATEWAY_URL", "http://llm-gateway:8000")
+LLM_GATEWAY_URL: str = os.getenv("LLM_GATEWAY_URL", "http://llm-gateway:8000").rstrip("/")
+
+# Token degli endpoint interni del gateway (stesso valore di LLM_INTERNAL_TOKEN del gateway).
+LLM_INTERNAL_TOKEN: str = os.getenv("LLM_INTERNAL_TOKEN", "")
+
+# Timeout delle chiamate al gateway LLM (connessione, lettura): tetto alla latenza di una
+# decisione, oltre il quale gli agenti ricadono sulle regole deterministiche.
+LLM_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "1.0"))
+LLM_READ_TIMEOUT_SECONDS: float = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", "5.0"))
+
+# --- Persistenza ----------------------------------------------------------------
+# Campionamento degli eventi "low" persistiti: 0 disattiva il campionamento. Attivarlo
+# riduce righe e POST verso il backend, ma i conteggi per severità della dashboard
+# riflettono allora solo gli eventi "low" campionati.
+PERSIST_LOW_SEVERITY_INTERVAL_SECONDS: float = float(
+    os.getenv("PERSIST_LOW_SEVERITY_INTERVAL_SECONDS", "0")
+)
@@ -19,7 +19,10 @@ Dipendenze esterne
 - LLM Gateway (FastAPI): espone endpoint:
     - POST /llm/decide_escalation
     - POST /llm/plan_coordination
+  oppure, se config.LLM_INTERNAL_TOKEN è impostato, le varianti interne
+  /llm/internal/* (header X-Internal), che evitano la validazione completa del corpo.
 - requests: client HTTP sincrono utilizzato per invocare tali endpoint.
+- orjson: serializzazione/deserializzazione JSON (estensione C) dei payload scambiati.
 
 Configurazione
 --------------
@@ -30,32 +33,246 @@ Note progettuali
 ----------------
 - Le funzioni applicano una validazione minima della risposta (tipo e chiavi attese),
   lasciando agli agenti la gestione dei fallback in caso di eccezioni.
+- Il timeout di default (DEFAULT_TIMEOUT, da config) separa connessione e lettura ed è
+  dell'ordine di pochi secondi: i chiamanti devono sempre prevedere un fallback.
+- Le chiamate passano da un'unica requests.Session di modulo con pool di connessioni:
+  le connessioni verso il gateway restano aperte (keep-alive) e vengono riusate tra
+  chiamate e thread, evitando handshake TCP e risoluzione DNS a ogni richiesta.
 - `response.raise_for_status()` solleva eccezioni su status 4xx/5xx, rendendo
   immediata la gestione dell'indisponibilità del gateway o di errori applicativi.
+- Più decisioni di escalation possono essere richieste insieme: submit_escalation_batch
+  avvia le chiamate HTTP in parallelo su un pool di thread condiviso (così che un lotto
+  di eventi paghi circa la latenza di una sola richiesta) e collect_escalation_results
+  ne raccoglie gli esiti, lasciando il chiamante libero di restare reattivo nel frattempo.
+- Un circuit breaker condiviso protegge gli agenti da un gateway degradato: dopo troppi
+  errori recenti le chiamate falliscono subito con CircuitOpenError (gli agenti applicano
+  il fallback deterministico) invece di attendere il timeout HTTP; trascorsa la finestra
+  di apertura, una singola chiamata di prova decide se richiudere il circuito.
 """
 
 import logging
-from typing import Any, Dict, List
-
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Tuple, Union
+
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from . import config
 
 # Logger di modulo per tracciare chiamate e diagnostica del canale LLM.
 logger = logging.getLogger(__name__)
 
-# Endpoint del gateway LLM:
-# - rstrip('/') evita doppi slash in caso di base URL che termina con '/'.
-DECIDE_ESCALATION_ENDPOINT = f"{config.LLM_GATEWAY_URL.rstrip('/')}/llm/decide_escalation"
-PLAN_COORDINATION_ENDPOINT = f"{config.LLM_GATEWAY_URL.rstrip('/')}/llm/plan_coordination"
+# Endpoint del gateway LLM (la base URL è già priva di '/' finale, vedi config).
+# Con il token condiviso si usano le varianti interne, riservate a client MAS fidati.
+_ENDPOINT_PREFIX = "/llm/internal" if config.LLM_INTERNAL_TOKEN else "/llm"
+DECIDE_ESCALATION_ENDPOINT = config.LLM_GATEWAY_URL + _ENDPOINT_PREFIX + "/decide_escalation"
+PLAN_COORDINATION_ENDPOINT = config.LLM_GATEWAY_URL + _ENDPOINT_PREFIX + "/plan_coordination"
+
+# Timeout delle chiamate: secondi oppure coppia (connessione, lettura), come in requests.
+# Il default è ben sotto il timeout verso il modello configurato nel gateway: una risposta
+# lenta diventa un fallback dell'agente invece di tenerne fermo il thread.
+Timeout = Union[float, Tuple[float, float]]
+DEFAULT_TIMEOUT: Tuple[float, float] = (
+    config.LLM_CONNECT_TIMEOUT_SECONDS,
+    config.LLM_READ_TIMEOUT_SECONDS,
+)
+
+# Header delle richieste: il corpo viene serializzato da orjson e passato come bytes.
+_JSON_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+if config.LLM_INTERNAL_TOKEN:
+    _JSON_HEADERS["X-Internal"] = config.LLM_INTERNAL_TOKEN
+
+# Pool di thread condiviso per le richieste di escalation in parallelo.
+# Il numero di worker limita le richieste contemporanee verso il gateway.
+_BATCH_MAX_WORKERS = 8
+_batch_pool = ThreadPoolExecutor(max_workers=_BATCH_MAX_WORKERS, thread_name_prefix="llm-batch")
+
+# Sessione HTTP condivisa con pool di connessioni persistenti verso il gateway.
+# - pool_maxsize copre i worker del pool batch più le chiamate dirette degli agenti;
+# - i retry riguardano solo errori di connessione (POST non è ripetuta da urllib3 dopo
+#   l'invio della richiesta), quindi non duplicano chiamate al modello;
+# - lo stesso adapter è montato anche su https://, così un gateway esposto in TLS
+#   riusa connessioni e handshake invece di ricadere sull'adapter di default.
+_SESSION = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.1),
+)
+_SESSION.mount("http://", _HTTP_ADAPTER)
+_SESSION.mount("https://", _HTTP_ADAPTER)
+
+# Circuit breaker verso il gateway: si apre quando almeno metà delle ultime
+# _BREAKER_WINDOW chiamate è fallita e resta aperto per _BREAKER_OPEN_SECONDS.
+_BREAKER_WINDOW = 5
+_BREAKER_OPEN_SECONDS = 10.0
+
+
+class CircuitOpenError(RuntimeError):
+    """
+    Sollevata quando il circuit breaker è aperto e la chiamata al gateway non viene eseguita.
+    """
+
+
+class _CircuitBreaker:
+    """
+    Circuit breaker thread-safe a tre stati (CLOSED / OPEN / HALF_OPEN).
+
+    - CLOSED: le chiamate passano; gli esiti delle ultime `window` chiamate sono registrati.
+    - OPEN: le chiamate falliscono subito fino alla scadenza di `open_seconds`.
+    - HALF_OPEN: passa una sola chiamata di prova; il suo esito richiude o riapre il circuito.
+    """
+
+    __slots__ = ("_lock", "_outcomes", "_window", "_open_seconds", "_opened_at", "_probing")
+
+    def __init__(self, window: int, open_seconds: float) -> None:
+        """
+        Inizializza il breaker in stato CLOSED.
+
+        Args:
+            window: Numero di esiti recenti considerati per l'apertura.
+            open_seconds: Durata dello stato OPEN prima della chiamata di prova.
+        """
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._window = window
+        self._open_seconds = open_seconds
+        # Istante di apertura (time.monotonic), None se il circuito è chiuso.
+        self._opened_at: Union[float, None] = None
+        self._probing = False
+
+    def is_open(self) -> bool:
+        """
+        Indica, senza consumare la chiamata di prova, se le chiamate verrebbero rifiutate.
+
+        Returns:
+            bool: True se il circuito è OPEN (o HALF_OPEN con la prova già in corso).
+        """
+        opened_at = self._opened_at
+        if opened_at is None:
+            return False
+        return self._probing or time.monotonic() - opened_at < self._open_seconds
+
+    def allow(self) -> bool:
+        """
+        Decide se una chiamata può essere eseguita.
+
+        Returns:
+            bool: True in stato CLOSED o per l'unica chiamata di prova in HALF_OPEN.
+        """
+        if self._opened_at is None:
+            # Percorso comune senza lock: lettura di un singolo attributo.
+            return True
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self._open_seconds:
+                return False
+            self._probing = True
+            return True
+
+    def record(self, success: bool) -> None:
+        """
+        Registra l'esito di una chiamata eseguita.
+
+        Args:
+            success: True se la chiamata al gateway è andata a buon fine.
+        """
+        with self._lock:
+            if self._probing:
+                # Esito della chiamata di prova: richiude o riapre il circuito.
+                self._probing = False
+                self._outcomes.clear()
+                if success:
+                    self._opened_at = None
+                    logger.info("Circuit breaker LLM richiuso.")
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            if self._opened_at is not None:
+                # Esito di una chiamata partita prima dell'apertura: già conteggiata.
+                return
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) == self._window and failures * 2 >= self._window:
+                self._opened_at = time.monotonic()
+                logger.warning(
+                    "Circuit breaker LLM aperto: %d errori nelle ultime %d chiamate.",
+                    failures,
+                    self._window,
+                )
+
+
+_breaker = _CircuitBreaker(_BREAKER_WINDOW, _BREAKER_OPEN_SECONDS)
+
+
+def _post_json(endpoint: str, payload: Dict[str, Any], timeout_seconds: Timeout) -> Any:
+    """
+    Esegue una POST verso il gateway attraverso il circuit breaker e ne decodifica la risposta.
+
+    Args:
+        endpoint: Endpoint del gateway.
+        payload: Corpo JSON della richiesta.
+        timeout_seconds: Timeout della chiamata HTTP.
+
+    Returns:
+        Any: Corpo della risposta decodificato.
+
+    Raises:
+        CircuitOpenError: Se il circuito è aperto (nessuna richiesta inviata).
+        requests.RequestException: Errori di rete, timeout o status 4xx/5xx.
+        ValueError: Se la risposta non è JSON valido.
+    """
+    if not _breaker.allow():
+        raise CircuitOpenError(f"Circuit breaker LLM aperto, chiamata a {endpoint} saltata")
+    try:
+        # Il corpo è serializzato con orjson, più rapido di json.dumps usato da `json=`.
+        response = _SESSION.post(
+            endpoint,
+            data=orjson.dumps(payload),
+            headers=_JSON_HEADERS,
+            timeout=timeout_seconds,
+        )
+        response.raise_for_status()
+    except Exception:
+        _breaker.record(False)
+        raise
+    _breaker.record(True)
+    # orjson.JSONDecodeError è un ValueError.
+    return orjson.loads(response.content)
+
+
+@dataclass(slots=True, frozen=True)
+class EscalationDecision:
+    """
+    Decisione di escalation restituita dal gateway, già validata e tipizzata.
+
+    Attributi
+    ---------
+    escalate:
+        True se l'evento va inoltrato al CityCoordinator.
+    normalized_severity:
+        Severità normalizzata dal modello (stringa non ancora minuscola/internata).
+    reason:
+        Motivazione sintetica della decisione.
+    """
+    escalate: bool
+    normalized_severity: str
+    reason: str = "llm_decision"
 
 
 def decide_escalation(
     district: str,
     recent_events: List[Dict[str, Any]],
     current_event: Dict[str, Any],
-    timeout_seconds: float = 30.0,
-) -> Dict[str, Any]:
+    timeout_seconds: Timeout = DEFAULT_TIMEOUT,
+) -> EscalationDecision:
     """
     Richiede al LLM Gateway una decisione di escalation per un evento di distretto.
 
@@ -64,18 +281,22 @@ def decide_escalation(
     Risposta JSON (dict) contenente almeno:
     - "escalate": bool
     - "normalized_severity": str
-    - "reason": str (può essere presente e viene gestita dal chiamante)
+    - "reason": str (facoltativo, default "llm_decision")
 
     Args:
         district: Identificativo del distretto che richiede la valutazione.
         recent_events: Lista di eventi recenti (contesto) in formato JSON-like.
         current_event: Evento corrente da valutare (focus).
-        timeout_seconds: Timeout della chiamata HTTP verso il gateway.
+        timeout_seconds: Timeout della chiamata HTTP verso il gateway (secondi o coppia
+            connessione/lettura; default DEFAULT_TIMEOUT).
 
     Returns:
-        Dict[str, Any]: Dizionario con decisione di escalation e severità normalizzata.
+        EscalationDecision: Decisione di escalation con severità normalizzata, con campi
+        già convertiti ai tipi attesi (il chiamante non rilegge né converte il dict).
 
     Raises:
+        CircuitOpenError:
+            Se il circuit breaker verso il gateway è aperto.
         requests.HTTPError:
             Sollevata da response.raise_for_status() in caso di status 4xx/5xx.
         ValueError:
@@ -92,27 +313,89 @@ def decide_escalation(
     logger.debug("Chiamata a LLM Gateway /llm/decide_escalation con payload=%s", payload)
 
     # Chiamata sincrona: in caso di timeout o errori di rete, requests solleverà eccezioni.
-    response = requests.post(DECIDE_ESCALATION_ENDPOINT, json=payload, timeout=timeout_seconds)
-    response.raise_for_status()
-
-    # Decodifica JSON della risposta del gateway.
-    data = response.json()
+    data = _post_json(DECIDE_ESCALATION_ENDPOINT, payload, timeout_seconds)
     if not isinstance(data, dict):
         # Il gateway dovrebbe sempre restituire un oggetto JSON; in caso contrario la risposta è inutilizzabile.
         raise ValueError(f"Risposta LLM non in formato dizionario: {data!r}")
 
-    # Validazione minima: garantisce che i campi fondamentali esistano.
-    if "escalate" not in data or "normalized_severity" not in data:
-        raise ValueError(f"Risposta LLM priva di chiavi attese: {data!r}")
+    # Validazione e conversione in un solo passaggio: i campi fondamentali devono esistere.
+    try:
+        escalate = data["escalate"]
+        normalized_severity = data["normalized_severity"]
+    except KeyError:
+        raise ValueError(f"Risposta LLM priva di chiavi attese: {data!r}") from None
+
+    return EscalationDecision(
+        escalate=bool(escalate),
+        normalized_severity=str(normalized_severity),
+        reason=str(data.get("reason", "llm_decision")),
+    )
+
+
+def submit_escalation_batch(
+    district: str,
+    requests_batch: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]],
+    timeout_seconds: Timeout = DEFAULT_TIMEOUT,
+) -> List["Future[EscalationDecision]"]:
+    """
+    Avvia sul pool condiviso le richieste di escalation per più eventi, senza attenderle.
 
-    return data
+    Consente al chiamante di restare reattivo (es. gestire comandi di controllo) mentre
+    le richieste sono in corso; i risultati si raccolgono con collect_escalation_results.
+
+    Args:
+        district: Identificativo del distretto che richiede la valutazione.
+        requests_batch: Coppie (recent_events, current_event), una per evento da valutare.
+        timeout_seconds: Timeout di ciascuna chiamata HTTP verso il gateway (secondi o
+            coppia connessione/lettura; default DEFAULT_TIMEOUT).
+
+    Returns:
+        List[Future[EscalationDecision]]: Future delle richieste, nello stesso ordine.
+        Con il circuit breaker aperto le future sono già completate con CircuitOpenError,
+        senza passare dal pool.
+    """
+    if _breaker.is_open():
+        failed: List["Future[EscalationDecision]"] = []
+        for _ in requests_batch:
+            future: "Future[EscalationDecision]" = Future()
+            future.set_exception(CircuitOpenError("Circuit breaker LLM aperto"))
+            failed.append(future)
+        return failed
+
+    return [
+        _batch_pool.submit(decide_escalation, district, recent_events, current_event, timeout_seconds)
+        for recent_events, current_event in requests_batch
+    ]
+
+
+def collect_escalation_results(
+    futures: List["Future[EscalationDecision]"],
+) -> List[Union[EscalationDecision, Exception]]:
+    """
+    Raccoglie i risultati delle richieste avviate con submit_escalation_batch.
+
+    Args:
+        futures: Future restituite da submit_escalation_batch.
+
+    Returns:
+        List[Union[EscalationDecision, Exception]]: Per ciascuna richiesta, nello stesso ordine,
+        la risposta del gateway oppure l'eccezione sollevata da decide_escalation: un errore
+        su un evento non impedisce di restituire le decisioni degli altri.
+    """
+    results: List[Union[EscalationDecision, Exception]] = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as exc:  # noqa: BLE001
+            results.append(exc)
+    return results
 
 
 def plan_coordination(
     source_district: str,
     critical_event: Dict[str, Any],
     city_state: List[Dict[str, Any]],
-    timeout_seconds: float = 30.0,
+    timeout_seconds: Timeout = DEFAULT_TIMEOUT,
 ) -> Dict[str, Any]:
     """
     Richiede al LLM Gateway un piano di coordinamento inter-distrettuale.
@@ -129,12 +412,15 @@ def plan_coordination(
         source_district: Distretto sorgente che ha generato l'evento critico.
         critical_event: Evento critico normalizzato da usare come input al modello.
         city_state: Stato sintetico della città (lista di distretti con metriche).
-        timeout_seconds: Timeout della chiamata HTTP verso il gateway.
+        timeout_seconds: Timeout della chiamata HTTP verso il gateway (secondi o coppia
+            connessione/lettura; default DEFAULT_TIMEOUT).
 
     Returns:
         Dict[str, Any]: Dizionario con chiave "plan" contenente una lista di azioni proposte.
 
     Raises:
+        CircuitOpenError:
+            Se il circuit breaker verso il gateway è aperto.
         requests.HTTPError:
             Sollevata da response.raise_for_status() in caso di status 4xx/5xx.
         ValueError:
@@ -149,10 +435,7 @@ def plan_coordination(
 
     logger.debug("Chiamata a LLM Gateway /llm/plan_coordination con payload=%s", payload)
 
-    response = requests.post(PLAN_COORDINATION_ENDPOINT, json=payload, timeout=timeout_seconds)
-    response.raise_for_status()
-
-    data = response.json()
+    data = _post_json(PLAN_COORDINATION_ENDPOINT, payload, timeout_seconds)
     if not isinstance(data, dict):
         raise ValueError(f"Risposta LLM (plan_coordination) non in formato dizionario: {data!r}")
 
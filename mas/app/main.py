@@ -4,40 +4,44 @@ Entry point del MAS (Multi-Agent System) per il monitoraggio urbano.
 Obiettivo
 ---------
 Avviare e orchestrare i componenti runtime del sistema:
-- Listener MQTT: sottoscrive i topic e inserisce eventi grezzi in una coda centrale.
+- Listener MQTT: sottoscrive i topic e inserisce eventi grezzi in un buffer centrale.
 - Router MQTT: smista gli eventi verso le code dei distretti (SensorEvent).
 - DistrictMonitoringAgent: agenti locali (uno per distretto) che processano eventi,
   persistono dati e decidono eventuali escalation al coordinatore.
 - CityCoordinatorAgent: agente centrale che gestisce escalation e comandi di coordinamento.
+- PersistenceWriter: thread che esegue le scritture verso il web-backend fuori dagli agenti.
 
 Ruolo nel sistema
 -----------------
 Questo modulo funge da "bootstrap" del MAS e definisce:
 - configurazione logging;
-- creazione delle code thread-safe utilizzate per la comunicazione tra componenti;
+- creazione delle code/buffer thread-safe utilizzati per la comunicazione tra componenti;
 - creazione e avvio dei thread (listener, router, agenti);
 - gestione di shutdown pulito tramite segnali (SIGINT/SIGTERM).
 
 Note progettuali
 ----------------
-- Il sistema è progettato in stile event-driven: ogni componente lavora su code queue.Queue
-  che garantiscono thread-safety e disaccoppiamento.
+- Il sistema è progettato in stile event-driven: ogni componente lavora su buffer thread-safe
+  (ring.RingBuffer dal listener MQTT al router e tra router e agenti) che garantiscono
+  disaccoppiamento senza blocchi sul percorso caldo.
 - Lo shutdown è cooperativo: ogni thread espone stop() e il main thread gestisce la terminazione
   in modo controllato, riducendo rischio di corruzione dello stato o perdita di log.
 """
 
 import logging
-import queue
 import signal
-import sys
-import time
-from typing import Dict
+import threading
+from typing import Any, Dict
 
-from . import config
+from . import config, persistence
 from .agent import CityCoordinatorAgent, DistrictMonitoringAgent, Message, SensorEvent
 from .mqtt_bridge import MQTTEventListener
+from .ring import RingBuffer
 from .router import MQTTRouterThread
 
+# Attesa massima per la terminazione di ciascun thread allo shutdown.
+_JOIN_TIMEOUT_SECONDS = 2.0
+
 
 def setup_logging() -> None:
     """
@@ -65,12 +69,13 @@ def main() -> None:
        - mqtt_event_queue: eventi grezzi dal listener MQTT (dict).
        - district_event_queues: code per distretto (SensorEvent).
        - district_control_queues: comandi per distretto (Message).
-       - coordinator_inbox: inbox per il CityCoordinator (Message).
-    3) Avvio listener MQTT e router.
+       - coordinator_inboxes: inbox per distretto verso il CityCoordinator (Message).
+    3) Avvio PersistenceWriter, router e listener MQTT (il router registra il proprio
+       campanello sul buffer centrale prima che il listener inizi a produrre).
     4) Avvio CityCoordinatorAgent.
     5) Avvio DistrictMonitoringAgent (uno per distretto).
     6) Registrazione handler segnali per shutdown (SIGINT/SIGTERM).
-    7) Loop di keep-alive fino a terminazione.
+    7) Attesa della richiesta di terminazione, poi stop e join dei thread.
     """
     setup_logging()
     logger = logging.getLogger(__name__)
@@ -78,22 +83,36 @@ def main() -> None:
     # Log descrittivo di avvio: utile per versioning/fasi del progetto e diagnosi.
     logger.info("Avvio MAS core - Fase 4: persistenza su SQLite via FastAPI.")
 
-    # Coda centrale di eventi grezzi (tipicamente dict ricavati dal payload MQTT).
-    # Viene consumata dal router per smistamento verso distretti.
-    mqtt_event_queue: "queue.Queue[dict]" = queue.Queue(maxsize=1000)
+    # Buffer centrale di eventi grezzi (tipicamente dict ricavati dal payload MQTT).
+    # Viene consumato dal router per smistamento verso distretti.
+    mqtt_event_queue: "RingBuffer[Dict[str, Any]]" = RingBuffer(1000)
+
+    # Buffer sensoriali per distretto: contengono SensorEvent già normalizzati.
+    district_event_queues: Dict[str, "RingBuffer[SensorEvent]"] = {
+        district: RingBuffer(200) for district in config.DISTRICTS
+    }
 
-    # Code sensoriali per distretto: contengono SensorEvent già normalizzati.
-    district_event_queues: Dict[str, "queue.Queue[SensorEvent]"] = {
-        district: queue.Queue(maxsize=200) for district in config.DISTRICTS
+    # Buffer di controllo per distretto: comandi dal coordinatore (Message).
+    district_control_queues: Dict[str, "RingBuffer[Message]"] = {
+        district: RingBuffer(200) for district in config.DISTRICTS
     }
 
-    # Code di controllo per distretto: comandi dal coordinatore (Message).
-    district_control_queues: Dict[str, "queue.Queue[Message]"] = {
-        district: queue.Queue(maxsize=200) for district in config.DISTRICTS
+    # Inbox del CityCoordinator, una per distretto: ricevono le escalation (Message).
+    coordinator_inboxes: Dict[str, "RingBuffer[Message]"] = {
+        district: RingBuffer(100) for district in config.DISTRICTS
     }
 
-    # Inbox del CityCoordinator: riceve escalation dai distretti (Message).
-    coordinator_inbox: "queue.Queue[Message]" = queue.Queue(maxsize=500)
+    # Writer di persistenza: esegue le POST accodate da agenti e coordinatore.
+    persistence_writer = persistence.PersistenceWriter()
+    persistence_writer.start()
+
+    # Router: trasforma e smista eventi dal buffer centrale verso le code dei distretti.
+    # Costruito prima del listener, perché registra il campanello sul buffer centrale.
+    router = MQTTRouterThread(
+        mqtt_event_queue=mqtt_event_queue,
+        district_queues=district_event_queues,
+    )
+    router.start()
 
     # Listener MQTT: sottoscrive topic_filter e inserisce eventi grezzi in mqtt_event_queue.
     mqtt_listener = MQTTEventListener(
@@ -104,16 +123,9 @@ def main() -> None:
     )
     mqtt_listener.start()
 
-    # Router: trasforma e smista eventi dalla coda centrale verso le code dei distretti.
-    router = MQTTRouterThread(
-        mqtt_event_queue=mqtt_event_queue,
-        district_queues=district_event_queues,
-    )
-    router.start()
-
     # CityCoordinatorAgent: gestisce escalation e invia comandi di coordinamento ai distretti.
     coordinator_agent = CityCoordinatorAgent(
-        inbox_queue=coordinator_inbox,
+        district_inboxes=coordinator_inboxes,
         district_control_queues=district_control_queues,
     )
     coordinator_agent.start()
@@ -125,52 +137,62 @@ def main() -> None:
             district=district,
             sensor_queue=district_event_queues[district],
             control_queue=district_control_queues[district],
-            coordinator_inbox=coordinator_inbox,
+            coordinator_inbox=coordinator_inboxes[district],
         )
         agent.start()
         district_agents.append(agent)
 
+    # Evento di terminazione: il main thread vi attende senza risvegli periodici.
+    shutdown_requested = threading.Event()
+
     def handle_sigterm(signum, frame):
         """
         Handler di terminazione per SIGINT/SIGTERM.
 
         Obiettivo
         ---------
-        Arrestare in modo ordinato tutti i thread, riducendo la probabilità di:
-        - perdita di messaggi ancora in elaborazione;
-        - log incompleti;
-        - risorse esterne non rilasciate (socket MQTT, ecc.).
+        Segnalare al main thread la richiesta di arresto. Lo shutdown vero e proprio
+        (stop e join dei thread) avviene nel main thread, fuori dal contesto del segnale.
 
         Args:
             signum: Segnale ricevuto (SIGINT o SIGTERM).
             frame: Frame stack (non utilizzato; richiesto dalla signature signal handler).
         """
         logger.info("Segnale di terminazione ricevuto (%s). Arresto in corso...", signum)
-
-        # Stop cooperativo: ogni agente terminerà il loop principale al prossimo check.
-        for agent in district_agents:
-            agent.stop()
-
-        coordinator_agent.stop()
-        router.stop()
-        mqtt_listener.stop()
-
-        # Piccola attesa per consentire flush log e uscita ordinata dai loop con timeout.
-        time.sleep(1.0)
-        sys.exit(0)
+        shutdown_requested.set()
 
     # Registrazione degli handler: Ctrl+C (SIGINT) e stop container (SIGTERM).
     signal.signal(signal.SIGINT, handle_sigterm)
     signal.signal(signal.SIGTERM, handle_sigterm)
 
-    # Loop di keep-alive: il main thread resta in esecuzione mentre i thread daemon lavorano.
+    # Attesa senza timeout: su POSIX l'attesa è interrotta dai segnali, il cui handler
+    # imposta l'evento e la sblocca.
     try:
-        while True:
-            time.sleep(60)
+        shutdown_requested.wait()
     except KeyboardInterrupt:
-        # Ridondanza difensiva: in caso di KeyboardInterrupt, si forza lo stesso flusso di shutdown.
-        handle_sigterm(signal.SIGINT, None)
-
+        # Ridondanza difensiva: in caso di KeyboardInterrupt, si procede con lo stesso shutdown.
+        pass
+
+    # Shutdown ordinato, riducendo la probabilità di:
+    # - perdita di messaggi ancora in elaborazione;
+    # - log incompleti;
+    # - risorse esterne non rilasciate (socket MQTT, ecc.).
+    # Prima si ferma l'ingresso degli eventi, poi gli agenti; il writer per ultimo, così
+    # svuota le scritture prodotte dagli agenti prima di terminare.
+    mqtt_listener.stop()
+    router.stop()
+    router.join(timeout=_JOIN_TIMEOUT_SECONDS)
+
+    for agent in district_agents:
+        agent.stop()
+    coordinator_agent.stop()
+    for agent in district_agents:
+        agent.join(timeout=_JOIN_TIMEOUT_SECONDS)
+    coordinator_agent.join(timeout=_JOIN_TIMEOUT_SECONDS)
+
+    persistence_writer.stop()
+    persistence_writer.join(timeout=_JOIN_TIMEOUT_SECONDS)
+    logger.info("MAS arrestato.")
 
 if __name__ == "__main__":
     # Esecuzione standalone (python -m mas.app.main oppure python mas/app/main.py).
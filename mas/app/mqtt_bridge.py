@@ -4,7 +4,7 @@ Bridge MQTT -> MAS (Multi-Agent System) per il monitoraggio urbano.
 Obiettivo
 ---------
 Sottoscrivere un topic filter MQTT e trasformare i messaggi ricevuti in eventi
-"raw" (dizionari) da inserire in una coda thread-safe, che verrà successivamente
+"raw" (dizionari) da inserire in un buffer thread-safe, che verrà successivamente
 consumata dal router del MAS per lo smistamento verso i distretti.
 
 Ruolo nel sistema
@@ -20,18 +20,25 @@ Note progettuali
 ----------------
 - La coda è usata per disaccoppiare il ritmo di arrivo dei messaggi MQTT dalla
   capacità di elaborazione del MAS (pattern producer/consumer).
-- L'inserimento in coda avviene in modalità non bloccante (put_nowait) per evitare
-  che il thread del client MQTT resti bloccato in caso di backlog (gestione overload).
+- L'inserimento in coda avviene in modalità non bloccante (RingBuffer.try_put) per evitare
+  che il thread del client MQTT resti bloccato in caso di backlog (gestione overload):
+  il buffer pieno è segnalato dal valore di ritorno, senza eccezioni.
 - In caso di payload non JSON, l'evento viene scartato e tracciato a log.
+- Il client usa la Callback API v2 di paho-mqtt (>= 2.0), l'unica non deprecata; il buffer
+  di destinazione è passato come userdata, così _on_message non lo risolve da self.
+- Il parsing usa orjson direttamente sui bytes del messaggio: niente decodifica
+  intermedia in str e un parser in C, che riduce il costo per messaggio nel thread
+  del client MQTT (il producer dell'intera pipeline).
 """
 
-import json
 import logging
-import queue
-from typing import Any
+from typing import Any, Dict
 
+import orjson
 import paho.mqtt.client as mqtt
 
+from .ring import RingBuffer
+
 # Logger di modulo: consente diagnosi del canale MQTT (connessione, subscribe, parsing, overload).
 logger = logging.getLogger(__name__)
 
@@ -45,10 +52,10 @@ class MQTTEventListener:
     - Configurare callbacks del client MQTT (on_connect, on_message).
     - Gestire la sottoscrizione al topic filter in fase di connessione.
     - Effettuare parsing JSON del payload e produrre un evento raw uniforme.
-    - Gestire overload della coda (queue.Full) senza bloccare il thread MQTT.
+    - Gestire overload della coda (buffer pieno) senza bloccare il thread MQTT.
     """
 
-    def __init__(self, broker_host: str, broker_port: int, topic_filter: str, event_queue: "queue.Queue[dict]") -> None:
+    def __init__(self, broker_host: str, broker_port: int, topic_filter: str, event_queue: "RingBuffer[Dict[str, Any]]") -> None:
         """
         Inizializza il listener MQTT.
 
@@ -56,20 +63,34 @@ class MQTTEventListener:
             broker_host: Hostname/IP del broker MQTT.
             broker_port: Porta del broker MQTT (tipicamente 1883).
             topic_filter: Filtro di sottoscrizione (wildcard MQTT consentite).
-            event_queue: Coda thread-safe su cui pubblicare gli eventi raw ricevuti.
+            event_queue: Buffer thread-safe su cui pubblicare gli eventi raw ricevuti.
         """
         self._broker_host = broker_host
         self._broker_port = broker_port
         self._topic_filter = topic_filter
-        self._queue = event_queue
 
-        # Creazione client MQTT.
+        # Livello DEBUG letto una volta: il log per-messaggio è saltato del tutto se disattivo
+        # (un cambio di livello a runtime richiede il riavvio del listener).
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+
+        # Creazione client MQTT (Callback API v2, protocollo MQTT 3.1.1).
         # `clean_session=True` avvia una sessione pulita (no state persistente sul broker).
-        self._client = mqtt.Client(clean_session=True)
+        self._client = mqtt.Client(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            clean_session=True,
+            userdata=event_queue,
+        )
         self._client.on_connect = self._on_connect
         self._client.on_message = self._on_message
 
-    def _on_connect(self, client: mqtt.Client, userdata: Any, flags: dict, rc: int) -> None:
+    def _on_connect(
+        self,
+        client: mqtt.Client,
+        userdata: Any,
+        flags: Any,
+        reason_code: Any,
+        properties: Any,
+    ) -> None:
         """
         Callback invocata alla connessione al broker.
 
@@ -77,49 +98,50 @@ class MQTTEventListener:
             client: Istanza del client MQTT.
             userdata: User data associati al client (non usati).
             flags: Flag di connessione.
-            rc: Return code (0 indica successo).
+            reason_code: Esito della connessione (ReasonCode di paho-mqtt).
+            properties: Proprietà MQTT v5 (non usate con MQTT 3.1.1).
         """
-        if rc == 0:
+        if not reason_code.is_failure:
             logger.info("Connesso al broker MQTT (%s:%s)", self._broker_host, self._broker_port)
             logger.info("Sottoscrizione al filtro: %s", self._topic_filter)
             client.subscribe(self._topic_filter)
         else:
-            # rc != 0: errore di connessione (es. auth fallita, broker non raggiungibile, ecc.).
-            logger.error("Connessione al broker MQTT fallita, rc=%s", rc)
+            # Errore di connessione (es. auth fallita, broker non raggiungibile, ecc.).
+            logger.error("Connessione al broker MQTT fallita, reason_code=%s", reason_code)
 
-    def _on_message(self, client: mqtt.Client, userdata: Any, msg: mqtt.MQTTMessage) -> None:
+    def _on_message(
+        self, client: mqtt.Client, userdata: "RingBuffer[Dict[str, Any]]", msg: mqtt.MQTTMessage
+    ) -> None:
         """
         Callback invocata per ogni messaggio MQTT ricevuto.
 
         Flusso
         ------
-        1) Decodifica bytes -> str (UTF-8 con error handling).
-        2) Parsing JSON del payload.
-        3) Creazione evento raw uniforme: {"topic": msg.topic, "payload": payload_dict}
-        4) Inserimento non bloccante in coda centrale.
+        1) Parsing JSON del payload direttamente dai bytes (orjson).
+        2) Creazione evento raw uniforme: {"topic": msg.topic, "payload": payload_dict}
+        3) Inserimento non bloccante in coda centrale.
 
         Args:
             client: Istanza del client MQTT.
-            userdata: User data associati al client (non usati).
+            userdata: Buffer centrale degli eventi raw (passato come userdata al client).
             msg: Messaggio MQTT ricevuto.
         """
-        # Decodifica robusta per evitare eccezioni su payload non UTF-8.
-        payload_str = msg.payload.decode("utf-8", errors="ignore")
         try:
-            payload = json.loads(payload_str)
-        except json.JSONDecodeError:
-            # Payload non JSON: in questo MAS si assume formato JSON; l'evento viene scartato.
-            logger.warning("Payload non valido su topic %s: %s", msg.topic, payload_str)
+            payload = orjson.loads(msg.payload)
+        except orjson.JSONDecodeError:
+            # Payload non JSON (o non UTF-8): in questo MAS si assume formato JSON; l'evento
+            # viene scartato.
+            logger.warning("Payload non valido su topic %s: %r", msg.topic, msg.payload)
             return
 
         # Evento raw: mantiene topic e payload già decodificato per il router del MAS.
         event = {"topic": msg.topic, "payload": payload}
 
-        try:
-            # Inserimento non bloccante: protegge il thread del client MQTT da backlog del MAS.
-            self._queue.put_nowait(event)
-            logger.debug("Evento MQTT messo in coda raw: %s", event)
-        except queue.Full:
+        # Inserimento non bloccante: protegge il thread del client MQTT da backlog del MAS.
+        if userdata.try_put(event):
+            if self._debug:
+                logger.debug("Evento MQTT messo in coda raw: %s", event)
+        else:
             # Overload: la coda centrale è satura (consumer troppo lento o burst di eventi).
             logger.error("Coda eventi MQTT raw piena, impossibile inserire evento da %s", msg.topic)
 
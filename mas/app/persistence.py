@@ -18,25 +18,45 @@ Integrazione
 ------------
 - WEB_BACKEND_URL (configurato in mas/app/config.py) è la base URL del servizio backend.
 - Gli endpoint utilizzati sono:
-    - POST /api/events   (EVENTS_ENDPOINT)
-    - POST /api/actions  (ACTIONS_ENDPOINT)
+    - POST /api/events/bulk   (EVENTS_BULK_ENDPOINT)
+    - POST /api/actions/bulk  (ACTIONS_BULK_ENDPOINT)
+  Gli endpoint a record singolo (/api/events, /api/actions) restano disponibili sul backend.
 
 Note progettuali
 ----------------
-- Le chiamate HTTP usano timeout molto basso (2s) per non bloccare i thread degli agenti.
+- persist_sensor_event e persist_action non eseguono I/O: accodano il payload in un
+  RingBuffer condiviso e ritornano subito, così il percorso critico degli agenti non
+  attende mai il backend. Le POST vengono eseguite da un unico thread PersistenceWriter,
+  avviato da main.py, che preleva i payload a lotti e li invia con una sola POST per
+  tipo di dato (array JSON verso l'endpoint bulk).
+- Le chiamate HTTP usano timeout molto basso (2s) per non accumulare ritardo nel writer
+  e passano direttamente da un urllib3.PoolManager condiviso, che riusa le connessioni
+  verso il backend senza lo strato di requests (preparazione della richiesta, hook,
+  decodifica della risposta) su ogni POST.
+- Se il buffer è saturo (backend lento o irraggiungibile) il payload viene scartato
+  con un log di errore, come già avviene per i fallimenti della POST.
 - Gli errori vengono gestiti a log senza propagare eccezioni: la persistenza è
   un "side effect" utile, ma il MAS deve continuare a funzionare anche se il backend
   è temporaneamente indisponibile.
 - Il payload viene normalizzato per garantire coerenza di campi anche in presenza
   di dati parziali in ingresso.
+- Opzionalmente (config.PERSIST_LOW_SEVERITY_INTERVAL_SECONDS > 0) gli eventi "low"
+  ripetuti vengono campionati: per ogni (distretto, sensore) si persiste il primo evento
+  "low" dopo un cambio di severità e poi al più uno per intervallo; gli eventi medium/high
+  sono sempre persistiti integralmente.
 """
 
 import logging
-from typing import Any, Dict
+import threading
+import time
+from typing import Any, Dict, List, Tuple
 
-import requests
+import orjson
+import urllib3
+from urllib3.util.retry import Retry
 
 from . import config
+from .ring import RingBuffer
 
 # Logger di modulo: usato per tracciare esito della persistenza e problemi di connettività.
 logger = logging.getLogger(__name__)
@@ -45,10 +65,191 @@ logger = logging.getLogger(__name__)
 EVENTS_ENDPOINT = f"{config.WEB_BACKEND_URL}/api/events"
 ACTIONS_ENDPOINT = f"{config.WEB_BACKEND_URL}/api/actions"
 
+# Endpoint bulk usati dal writer: ricevono un array JSON di payload per richiesta.
+EVENTS_BULK_ENDPOINT = f"{EVENTS_ENDPOINT}/bulk"
+ACTIONS_BULK_ENDPOINT = f"{ACTIONS_ENDPOINT}/bulk"
+
+# Header delle POST: il corpo viene serializzato da orjson e passato come bytes.
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Pool di connessioni condiviso dal PersistenceWriter: connessioni keep-alive verso il backend.
+# - le POST partono da un solo thread, quindi un pool piccolo è sufficiente;
+# - i retry (brevi, con backoff) coprono solo errori di connessione: urllib3 non ripete
+#   una POST già inviata, quindi non si creano righe duplicate;
+# - a differenza di requests, non legge proxy/netrc dall'ambiente: il backend è un
+#   servizio interno raggiunto direttamente.
+_POOL = urllib3.PoolManager(
+    num_pools=2,
+    maxsize=4,
+    retries=Retry(total=2, backoff_factor=0.1),
+)
+
+# Timeout corto: evita che un backend lento accumuli ritardo nel writer.
+_POST_TIMEOUT = urllib3.Timeout(total=2.0)
+
+# Buffer delle scritture in attesa: coppie (endpoint, payload) prodotte dagli agenti
+# e consumate dal PersistenceWriter.
+_WRITE_BUFFER_CAPACITY = 5000
+_write_buffer: "RingBuffer[Tuple[str, Dict[str, Any]]]" = RingBuffer(_WRITE_BUFFER_CAPACITY)
+
+# Numero massimo di scritture prelevate per giro e attesa del writer a buffer vuoto.
+_WRITE_BATCH_SIZE = 100
+_WRITER_IDLE_SECONDS = 0.05
+
+# Campionamento degli eventi "low": istante (time.monotonic) dell'ultimo evento "low"
+# persistito per (distretto, sensore). Ogni chiave è aggiornata da un solo agente di
+# distretto, quindi non serve un lock.
+_LOW_SEVERITY = "low"
+_LOW_SEVERITY_INTERVAL = config.PERSIST_LOW_SEVERITY_INTERVAL_SECONDS
+_last_low_persisted: Dict[Tuple[str, str], float] = {}
+
+
+def _enqueue(endpoint: str, payload: Dict[str, Any], kind: str) -> None:
+    """
+    Accoda una scrittura per il PersistenceWriter, senza bloccare.
+
+    Args:
+        endpoint: Endpoint REST di destinazione.
+        payload: Corpo JSON della richiesta.
+        kind: Descrizione del dato ("evento"/"azione"), usata nei log.
+    """
+    if not _write_buffer.try_put((endpoint, payload)):
+        logger.error("Buffer di persistenza pieno, %s scartato.", kind)
+
+
+def _skip_low_severity(payload: Dict[str, Any]) -> bool:
+    """
+    Indica se un evento può essere omesso dal campionamento degli eventi "low".
+
+    Args:
+        payload: Payload normalizzato dell'evento.
+
+    Returns:
+        bool: True se l'evento è "low" e un altro evento "low" dello stesso
+        (distretto, sensore) è stato persistito da meno dell'intervallo configurato.
+    """
+    key = (payload["district"], payload["sensor_type"])
+    if payload["severity"] != _LOW_SEVERITY:
+        # Cambio di severità: il prossimo evento "low" sarà persistito subito.
+        _last_low_persisted.pop(key, None)
+        return False
+    now = time.monotonic()
+    last = _last_low_persisted.get(key)
+    if last is not None and now - last < _LOW_SEVERITY_INTERVAL:
+        return True
+    _last_low_persisted[key] = now
+    return False
+
+
+def _post(endpoint: str, payload: List[Dict[str, Any]]) -> None:
+    """
+    Esegue la POST di un lotto di payload verso un endpoint bulk del web-backend.
+
+    Args:
+        endpoint: Endpoint REST bulk di destinazione.
+        payload: Lista dei record da inserire (corpo JSON della richiesta).
+
+    Comportamento
+    -------------
+    - Logga warning se il backend risponde con status diverso da 200/201.
+    - In caso di eccezioni (rete, timeout, ecc.) logga errore e prosegue.
+    """
+    try:
+        response = _POOL.request(
+            "POST",
+            endpoint,
+            body=orjson.dumps(payload),
+            headers=_JSON_HEADERS,
+            timeout=_POST_TIMEOUT,
+        )
+        if response.status not in (200, 201):
+            # Il corpo della risposta viene decodificato solo in caso di errore.
+            logger.warning(
+                "Persistenza fallita su %s (%d record): %s %s",
+                endpoint,
+                len(payload),
+                response.status,
+                response.data.decode("utf-8", errors="replace"),
+            )
+    except Exception as exc:
+        # Error handling conservativo: la persistenza non deve interrompere la pipeline MAS.
+        logger.error("Errore durante la persistenza su %s (%d record): %s", endpoint, len(payload), exc)
+
+
+def flush_pending(max_items: int = _WRITE_BATCH_SIZE) -> int:
+    """
+    Esegue le scritture in attesa, fino a `max_items`.
+
+    I payload prelevati vengono raggruppati per endpoint e inviati con una POST per
+    gruppo verso il corrispondente endpoint bulk, mantenendo l'ordine di accodamento.
+
+    Args:
+        max_items: Numero massimo di scritture da eseguire.
+
+    Returns:
+        int: Numero di scritture prelevate dal buffer.
+    """
+    batch = _write_buffer.drain(max_items)
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for endpoint, payload in batch:
+        group = groups.get(endpoint)
+        if group is None:
+            group = groups[endpoint] = []
+        group.append(payload)
+    for endpoint, payloads in groups.items():
+        _post(endpoint, payloads)
+    return len(batch)
+
+
+class PersistenceWriter(threading.Thread):
+    """
+    Thread dedicato alle scritture verso il web-backend.
+
+    Responsabilità
+    --------------
+    - Preleva a lotti le scritture accodate da persist_sensor_event / persist_action.
+    - Esegue le POST fuori dal percorso critico degli agenti.
+    - Allo stop, svuota le scritture residue prima di terminare.
+    """
+
+    def __init__(self) -> None:
+        """
+        Inizializza il writer come thread daemon.
+        """
+        super().__init__(name="PersistenceWriter", daemon=True)
+        self._running = threading.Event()
+        self._running.set()
+
+    def run(self) -> None:
+        """
+        Main loop del writer.
+
+        Flusso
+        ------
+        - Esegue fino a _WRITE_BATCH_SIZE scritture per giro.
+        - Se il buffer è vuoto attende _WRITER_IDLE_SECONDS prima di riprovare.
+        - All'uscita dal loop esegue le scritture ancora in attesa.
+        """
+        logger.info("PersistenceWriter avviato.")
+        while self._running.is_set():
+            if flush_pending() == 0:
+                time.sleep(_WRITER_IDLE_SECONDS)
+
+        # Svuotamento finale: limita la perdita di dati allo shutdown.
+        while flush_pending():
+            pass
+        logger.info("PersistenceWriter arrestato.")
+
+    def stop(self) -> None:
+        """
+        Richiede l'arresto cooperativo del writer.
+        """
+        self._running.clear()
+
 
 def persist_sensor_event(event_data: Dict[str, Any]) -> None:
     """
-    Persiste un evento sensoriale sul web-backend.
+    Accoda la persistenza di un evento sensoriale sul web-backend.
 
     Args:
         event_data: Dizionario con i dati dell'evento (proveniente tipicamente da SensorEvent.to_dict()).
@@ -56,9 +257,9 @@ def persist_sensor_event(event_data: Dict[str, Any]) -> None:
     Comportamento
     -------------
     - Costruisce un payload normalizzato con default sicuri.
-    - Effettua una POST verso EVENTS_ENDPOINT.
-    - Logga warning se il backend risponde con status diverso da 200/201.
-    - In caso di eccezioni (rete, timeout, ecc.) logga errore e prosegue.
+    - Lo accoda per il PersistenceWriter, che lo invia a lotti verso EVENTS_BULK_ENDPOINT.
+    - Non blocca e non solleva eccezioni: se il buffer è pieno logga errore e prosegue.
+    - Con il campionamento attivo, omette gli eventi "low" ripetuti entro l'intervallo.
     """
     # Normalizzazione dei campi: si usa .get() con default per garantire payload completo.
     payload = {
@@ -70,14 +271,9 @@ def persist_sensor_event(event_data: Dict[str, Any]) -> None:
         "timestamp": event_data.get("timestamp", ""),
         "topic": event_data.get("topic", ""),
     }
-    try:
-        # Timeout corto: evita blocchi prolungati nei thread degli agenti.
-        response = requests.post(EVENTS_ENDPOINT, json=payload, timeout=2.0)
-        if response.status_code not in (200, 201):
-            logger.warning("Persistenza evento fallita: %s %s", response.status_code, response.text)
-    except Exception as exc:
-        # Error handling conservativo: la persistenza non deve interrompere la pipeline MAS.
-        logger.error("Errore durante la persistenza dell'evento: %s", exc)
+    if _LOW_SEVERITY_INTERVAL > 0 and _skip_low_severity(payload):
+        return
+    _enqueue(EVENTS_BULK_ENDPOINT, payload, "evento")
 
 
 def persist_action(
@@ -88,7 +284,7 @@ def persist_action(
     event_snapshot: Dict[str, Any],
 ) -> None:
     """
-    Persiste un'azione di coordinamento sul web-backend.
+    Accoda la persistenza di un'azione di coordinamento sul web-backend.
 
     Args:
         source_district: Distretto che ha generato l'escalation (origine dell'azione).
@@ -100,9 +296,8 @@ def persist_action(
     Comportamento
     -------------
     - Costruisce il payload con i campi essenziali per auditing e dashboard.
-    - Effettua una POST verso ACTIONS_ENDPOINT.
-    - Logga warning se status diverso da 200/201.
-    - Logga errore e prosegue in caso di eccezioni.
+    - Lo accoda per il PersistenceWriter, che lo invia a lotti verso ACTIONS_BULK_ENDPOINT.
+    - Non blocca e non solleva eccezioni: se il buffer è pieno logga errore e prosegue.
     """
     payload = {
         "source_district": source_district,
@@ -111,9 +306,4 @@ def persist_action(
         "reason": reason,
         "event_snapshot": event_snapshot,
     }
-    try:
-        response = requests.post(ACTIONS_ENDPOINT, json=payload, timeout=2.0)
-        if response.status_code not in (200, 201):
-            logger.warning("Persistenza azione fallita: %s %s", response.status_code, response.text)
-    except Exception as exc:
-        logger.error("Errore durante la persistenza dell'azione: %s", exc)
+    _enqueue(ACTIONS_BULK_ENDPOINT, payload, "azione")
@@ -0,0 +1,189 @@
+"""
+Buffer circolari limitati per lo scambio di messaggi tra i thread del MAS.
+
+Obiettivo
+---------
+Fornire una coda MPMC (multi-producer / multi-consumer) a capacità fissa, con
+operazioni non bloccanti `try_put` / `try_get`, da usare al posto di queue.Queue
+sui percorsi caldi tra router, agenti di distretto e coordinatore.
+
+Ruolo nel sistema
+-----------------
+Le code queue.Queue acquisiscono un mutex e notificano una condition variable a ogni
+put/get: con molti distretti che pubblicano eventi, la sincronizzazione diventa il
+costo dominante del passaggio MQTT -> router -> agente. RingBuffer sostituisce:
+- mqtt_event_queue (listener MQTT -> MQTTRouterThread),
+- sensor_queue (router -> DistrictMonitoringAgent),
+- control_queue (CityCoordinatorAgent -> DistrictMonitoringAgent),
+- coordinator_inboxes (DistrictMonitoringAgent -> CityCoordinatorAgent, una per distretto).
+
+Note progettuali
+----------------
+- Lo storage è una collections.deque: in CPython `append` e `popleft` sono operazioni
+  atomiche (eseguite sotto GIL in un'unica chiamata C), quindi la struttura è sicura tra
+  thread senza lock espliciti né CAS. Un ring con indici su slot preallocati e padding
+  delle cache line non porterebbe benefici in Python puro, dove gli oggetti sono comunque
+  riferimenti e l'avanzamento degli indici richiederebbe un lock.
+- La capacità è un limite "morbido": il controllo della lunghezza e l'inserimento non
+  sono un'unica operazione atomica, quindi con più producer concorrenti il buffer può
+  superare la capacità di pochi elementi. È sufficiente a proteggere la memoria in
+  caso di backlog, che è lo scopo del limite.
+- Le operazioni non sollevano eccezioni sul percorso normale: buffer pieno e buffer
+  vuoto sono segnalati dal valore di ritorno (False / None).
+- Per attendere senza polling, il consumer può associare al buffer un "campanello"
+  (threading.Event, anche condiviso tra più buffer dello stesso consumer): try_put lo
+  suona dopo l'inserimento, ma solo se non è già suonato, così sotto carico il producer
+  non acquisisce il lock interno dell'Event a ogni messaggio. Il consumer azzera il
+  campanello, ricontrolla i buffer e solo se sono vuoti si mette in attesa.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Attese del producer in put_wait quando il buffer è pieno (backoff crescente).
+_PUT_WAIT_MIN_SECONDS = 0.001
+_PUT_WAIT_MAX_SECONDS = 0.05
+
+
+class RingBuffer(Generic[T]):
+    """
+    Coda FIFO a capacità limitata, thread-safe senza lock espliciti.
+
+    Attributi
+    ---------
+    capacity:
+        Numero massimo (indicativo) di elementi mantenuti nel buffer.
+    """
+
+    __slots__ = ("_items", "_capacity", "_doorbell")
+
+    def __init__(self, capacity: int) -> None:
+        """
+        Inizializza il buffer.
+
+        Args:
+            capacity: Capacità massima del buffer (deve essere positiva).
+
+        Raises:
+            ValueError: se capacity non è positiva.
+        """
+        if capacity <= 0:
+            raise ValueError(f"Capacità del RingBuffer non valida: {capacity}")
+        self._items: Deque[T] = deque()
+        self._capacity = capacity
+        self._doorbell: Optional[threading.Event] = None
+
+    @property
+    def capacity(self) -> int:
+        """
+        Capacità massima del buffer.
+
+        Returns:
+            int: Numero massimo di elementi accettati.
+        """
+        return self._capacity
+
+    def set_doorbell(self, doorbell: threading.Event) -> None:
+        """
+        Associa al buffer l'Event da segnalare a ogni inserimento.
+
+        Va chiamato dal consumer prima dell'avvio dei producer.
+
+        Args:
+            doorbell: Event su cui il consumer attende quando i suoi buffer sono vuoti.
+        """
+        self._doorbell = doorbell
+
+    def try_put(self, item: T) -> bool:
+        """
+        Inserisce un elemento in coda, senza bloccare.
+
+        Args:
+            item: Elemento da accodare.
+
+        Returns:
+            bool: True se l'elemento è stato inserito, False se il buffer è pieno.
+        """
+        if len(self._items) >= self._capacity:
+            return False
+        self._items.append(item)
+        doorbell = self._doorbell
+        # is_set() è una semplice lettura: set() (che acquisisce un lock) solo se serve.
+        if doorbell is not None and not doorbell.is_set():
+            doorbell.set()
+        return True
+
+    def put_wait(self, item: T, timeout: float) -> bool:
+        """
+        Inserisce un elemento attendendo al più `timeout` secondi che si liberi spazio.
+
+        Pensato per i messaggi che non conviene scartare al primo buffer pieno: il producer
+        rallenta (back-pressure) invece di perdere subito il messaggio. L'attesa usa un
+        backoff crescente, dato che il consumer non notifica il rilascio di spazio.
+
+        Args:
+            item: Elemento da accodare.
+            timeout: Attesa massima in secondi.
+
+        Returns:
+            bool: True se l'elemento è stato inserito, False se il buffer è rimasto pieno.
+        """
+        if self.try_put(item):
+            return True
+        deadline = time.monotonic() + timeout
+        wait = _PUT_WAIT_MIN_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+            if self.try_put(item):
+                return True
+            wait = min(wait * 2, _PUT_WAIT_MAX_SECONDS)
+
+    def try_get(self) -> Optional[T]:
+        """
+        Estrae l'elemento più vecchio, senza bloccare.
+
+        Returns:
+            Optional[T]: Elemento estratto, oppure None se il buffer è vuoto.
+        """
+        try:
+            return self._items.popleft()
+        except IndexError:
+            return None
+
+    def drain(self, max_items: int) -> List[T]:
+        """
+        Estrae fino a `max_items` elementi in ordine FIFO, senza bloccare.
+
+        Consente ai consumer di elaborare gli elementi a lotti, ammortizzando il costo
+        per-messaggio del ciclo di attesa.
+
+        Args:
+            max_items: Numero massimo di elementi da estrarre.
+
+        Returns:
+            List[T]: Elementi estratti (lista vuota se il buffer è vuoto).
+        """
+        batch: List[T] = []
+        popleft = self._items.popleft
+        try:
+            while len(batch) < max_items:
+                batch.append(popleft())
+        except IndexError:
+            pass
+        return batch
+
+    def __len__(self) -> int:
+        """
+        Numero di elementi attualmente presenti nel buffer.
+
+        Returns:
+            int: Lunghezza corrente (istantanea, può cambiare subito dopo la lettura).
+        """
+        return len(self._items)
@@ -10,8 +10,8 @@ in oggetti SensorEvent normalizzati.
 Ruolo nel sistema
 -----------------
 Questo thread rappresenta lo strato di "routing" tra:
-- mqtt_event_queue: coda centrale con eventi grezzi del tipo {"topic": ..., "payload": ...}
-- district_queues: code per distretto che alimentano i DistrictMonitoringAgent
+- mqtt_event_queue: buffer centrale (RingBuffer) con eventi grezzi del tipo {"topic": ..., "payload": ...}
+- district_queues: buffer per distretto (RingBuffer) che alimentano i DistrictMonitoringAgent
 
 Il router realizza quindi un disaccoppiamento tra:
 - arrivo dei messaggi MQTT (potenzialmente bursty e non controllato),
@@ -19,23 +19,30 @@ Il router realizza quindi un disaccoppiamento tra:
 
 Note progettuali
 ----------------
-- Il router è un thread daemon che opera in loop con timeout, così da poter essere
-  arrestato in modo cooperativo tramite flag threading.Event.
-- L'inserimento nelle code dei distretti avviene in modalità non bloccante (put_nowait),
+- Il passaggio listener MQTT -> router è single-producer / single-consumer (thread di
+  paho -> router): il buffer centrale è un RingBuffer, che non acquisisce mutex né
+  notifica condition variable a ogni evento come queue.Queue.
+- Il router preleva gli eventi a lotti e, a buffer vuoto, attende sul campanello del
+  buffer senza timeout (nessun risveglio periodico a riposo); lo stop è cooperativo:
+  stop() azzera il flag threading.Event e suona il campanello per sbloccare l'attesa.
+- L'inserimento nei buffer dei distretti avviene in modalità non bloccante (try_put),
   prevenendo blocchi sistemici nel caso in cui un distretto sia sovraccarico.
 - Se un evento arriva per un distretto non noto (non configurato), viene scartato e loggato.
 """
 
 import logging
-import queue
 import threading
-from typing import Dict
+from typing import Any, Dict
 
 from .agent import SensorEvent
+from .ring import RingBuffer
 
 # Logger di modulo: utile per tracciare routing, scarti e condizioni di overload.
 logger = logging.getLogger(__name__)
 
+# Numero massimo di eventi raw prelevati per giro dal buffer centrale.
+_ROUTER_BATCH_SIZE = 64
+
 
 class MQTTRouterThread(threading.Thread):
     """
@@ -43,7 +50,7 @@ class MQTTRouterThread(threading.Thread):
 
     Responsabilità
     --------------
-    - Consumare eventi raw dalla mqtt_event_queue.
+    - Consumare eventi raw dal buffer mqtt_event_queue.
     - Estrarre distretto dal payload.
     - Validare che il distretto sia tra quelli gestiti.
     - Convertire payload raw in SensorEvent (normalizzazione).
@@ -52,20 +59,29 @@ class MQTTRouterThread(threading.Thread):
 
     def __init__(
         self,
-        mqtt_event_queue: "queue.Queue[dict]",
-        district_queues: Dict[str, "queue.Queue[SensorEvent]"],
+        mqtt_event_queue: "RingBuffer[Dict[str, Any]]",
+        district_queues: Dict[str, "RingBuffer[SensorEvent]"],
     ) -> None:
         """
-        Inizializza il router.
+        Inizializza il router e registra il suo campanello sul buffer centrale.
+
+        Va costruito prima dell'avvio del listener MQTT, che è il producer del buffer.
 
         Args:
-            mqtt_event_queue: Coda centrale contenente eventi raw dal listener MQTT.
+            mqtt_event_queue: Buffer centrale contenente eventi raw dal listener MQTT.
             district_queues: Mapping distretto -> coda eventi (SensorEvent) per l'agente locale.
         """
         super().__init__(name="MQTTRouterThread", daemon=True)
         self._mqtt_event_queue = mqtt_event_queue
         self._district_queues = district_queues
 
+        # Campanello suonato dal listener a ogni inserimento nel buffer centrale.
+        self._wakeup = threading.Event()
+        mqtt_event_queue.set_doorbell(self._wakeup)
+
+        # Livello DEBUG letto una volta: il log per-evento è saltato del tutto se disattivo.
+        self._debug = logger.isEnabledFor(logging.DEBUG)
+
         # Flag di esecuzione per stop cooperativo.
         self._running = threading.Event()
         self._running.set()
@@ -76,46 +92,69 @@ class MQTTRouterThread(threading.Thread):
 
         Flusso
         ------
-        - Attende un evento raw con timeout per mantenere responsività allo stop.
-        - Estrae topic e payload.
-        - Ricava il distretto dal payload.
-        - Se distretto non configurato: scarta e logga.
-        - Altrimenti: crea SensorEvent e inserisce nella coda del distretto in modo non bloccante.
+        - Preleva fino a _ROUTER_BATCH_SIZE eventi raw e li instrada uno a uno.
+        - A buffer vuoto: azzera il campanello, ricontrolla il buffer e attende senza timeout.
+        - Termina quando `_running` viene azzerato da stop().
         """
         logger.info("MQTTRouterThread avviato.")
+        mqtt_event_queue = self._mqtt_event_queue
         while self._running.is_set():
-            try:
-                # Attesa di un evento raw (timeout per permettere stop reattivo).
-                event = self._mqtt_event_queue.get(timeout=1.0)
-            except queue.Empty:
+            events = mqtt_event_queue.drain(_ROUTER_BATCH_SIZE)
+            if events:
+                for event in events:
+                    self._route_event(event)
                 continue
 
-            topic = event.get("topic", "")
-            payload = event.get("payload", {})
-            district = str(payload.get("district", "unknown"))
-
-            # Validazione: si instradano solo eventi per distretti noti/configurati.
-            if district not in self._district_queues:
-                logger.warning(
-                    "Evento per distretto sconosciuto '%s' su topic %s: %s",
-                    district,
-                    topic,
-                    payload,
-                )
+            # Azzeramento e ricontrollo prima dell'attesa: un inserimento avvenuto nel
+            # frattempo o trova il campanello azzerato (e lo suona) o è visto qui.
+            self._wakeup.clear()
+            if len(mqtt_event_queue):
                 continue
+            self._wakeup.wait()
+
+    def _route_event(self, event: Dict[str, Any]) -> None:
+        """
+        Instrada un singolo evento raw verso il buffer del distretto.
 
-            # Normalizzazione del payload in oggetto SensorEvent coerente con il MAS.
-            sensor_event = SensorEvent.from_raw(topic, payload)
-            try:
-                # Inserimento non bloccante: evita che un distretto congestionato blocchi l'intero routing.
-                self._district_queues[district].put_nowait(sensor_event)
+        Flusso
+        ------
+        - Estrae topic e payload.
+        - Ricava il distretto dal payload.
+        - Se distretto non configurato: scarta e logga.
+        - Altrimenti: crea SensorEvent e inserisce nella coda del distretto in modo non bloccante.
+
+        Args:
+            event: Evento raw {"topic": ..., "payload": ...} prodotto dal listener MQTT.
+        """
+        topic = event.get("topic", "")
+        payload = event.get("payload", {})
+        district = str(payload.get("district", "unknown"))
+
+        # Validazione e routing con un solo lookup: si instradano solo eventi per
+        # distretti noti/configurati.
+        district_queue = self._district_queues.get(district)
+        if district_queue is None:
+            logger.warning(
+                "Evento per distretto sconosciuto '%s' su topic %s: %s",
+                district,
+                topic,
+                payload,
+            )
+            return
+
+        # Normalizzazione del payload in oggetto SensorEvent coerente con il MAS; il
+        # distretto già ricavato viene riusato invece di essere riletto dal payload.
+        sensor_event = SensorEvent.from_raw(topic, payload, district=district)
+        # Inserimento non bloccante: evita che un distretto congestionato blocchi l'intero routing.
+        if district_queue.try_put(sensor_event):
+            if self._debug:
                 logger.debug("Instradato evento verso %s: %s", district, sensor_event)
-            except queue.Full:
-                # Overload localizzato: la coda del distretto è satura (consumer troppo lento o burst eccessivo).
-                logger.error(
-                    "Coda eventi per distretto %s piena, impossibile instradare evento.",
-                    district,
-                )
+        else:
+            # Overload localizzato: la coda del distretto è satura (consumer troppo lento o burst eccessivo).
+            logger.error(
+                "Coda eventi per distretto %s piena, impossibile instradare evento.",
+                district,
+            )
 
     def stop(self) -> None:
         """
@@ -123,8 +162,9 @@ class MQTTRouterThread(threading.Thread):
 
         Nota
         ----
-        Il loop `run()` verifica periodicamente `_running.is_set()` e usa timeout su get(),
-        quindi lo stop avviene senza necessità di interrompere forzatamente il thread.
+        Il campanello viene suonato dopo aver azzerato `_running`, così un router in attesa
+        si risveglia subito e termina.
         """
         logger.info("Richiesta di arresto per MQTTRouterThread...")
         self._running.clear()
+        self._wakeup.set()
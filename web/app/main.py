@@ -24,8 +24,8 @@ Struttura
     - GET /actions
     - GET /llm-insights
 - API:
-    - POST /api/events,  GET /api/events
-    - POST /api/actions, GET /api/actions
+    - POST /api/events,  GET /api/events,  POST /api/events/bulk
+    - POST /api/actions, GET /api/actions, POST /api/actions/bulk
 
 Note progettuali
 ----------------
@@ -924,6 +924,35 @@ def create_event(event: schemas.EventCreate, db: Session = Depends(get_db)):
   return db_event
 
 
+@app.post("/api/events/bulk", response_model=schemas.BulkInsertResult)
+def create_events_bulk(events: list[schemas.EventCreate], db: Session = Depends(get_db)):
+  """
+  API: crea più eventi in un'unica transazione.
+
+  Nota
+  ----
+  Endpoint usato dal PersistenceWriter del MAS, che invia a lotti gli eventi accodati:
+  un solo commit per lotto invece di uno per evento, e nessun refresh delle righe
+  (gli id non servono al chiamante).
+  """
+  db.add_all(
+    [
+      models.Event(
+        district=event.district,
+        sensor_type=event.sensor_type,
+        value=event.value,
+        unit=event.unit,
+        severity=event.severity,
+        timestamp=event.timestamp,
+        topic=event.topic,
+      )
+      for event in events
+    ]
+  )
+  db.commit()
+  return schemas.BulkInsertResult(inserted=len(events))
+
+
 @app.get("/api/events", response_model=list[schemas.EventRead])
 def list_events(db: Session = Depends(get_db), limit: int = 100):
   """
@@ -964,6 +993,31 @@ def create_action(action: schemas.ActionCreate, db: Session = Depends(get_db)):
   )
 
 
+@app.post("/api/actions/bulk", response_model=schemas.BulkInsertResult)
+def create_actions_bulk(actions: list[schemas.ActionCreate], db: Session = Depends(get_db)):
+  """
+  API: crea più azioni di coordinamento in un'unica transazione.
+
+  Nota
+  ----
+  Come per create_action, event_snapshot viene serializzato in JSON string per storage su DB.
+  """
+  db.add_all(
+    [
+      models.Action(
+        source_district=action.source_district,
+        target_district=action.target_district,
+        action_type=action.action_type,
+        reason=action.reason or "",
+        event_snapshot=json.dumps(action.event_snapshot),
+      )
+      for action in actions
+    ]
+  )
+  db.commit()
+  return schemas.BulkInsertResult(inserted=len(actions))
+
+
 @app.get("/api/actions", response_model=list[schemas.ActionRead])
 def list_actions(db: Session = Depends(get_db), limit: int = 100):
   """
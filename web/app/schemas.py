@@ -6,6 +6,7 @@ Obiettivo
 Definire i modelli di validazione e serializzazione utilizzati dagli endpoint REST:
 - /api/events   (creazione e lettura eventi)
 - /api/actions  (creazione e lettura azioni)
+- /api/events/bulk, /api/actions/bulk (inserimento a lotti dal MAS)
 
 Ruolo nel sistema
 -----------------
@@ -96,3 +97,14 @@ class ActionRead(ActionCreate):
     class Config:
         # Permette a Pydantic di leggere attributi da oggetti ORM SQLAlchemy.
         orm_mode = True
+
+
+class BulkInsertResult(BaseModel):
+    """
+    Esito di un inserimento a lotti (POST /api/events/bulk e /api/actions/bulk).
+
+    Campi
+    -----
+    - inserted: numero di record inseriti nel DB
+    """
+    inserted: int